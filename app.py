@@ -1,10 +1,174 @@
-from flask import Flask, render_template, request, jsonify
+import gc
+import io
+import json
+import os
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from src.recommender import RecommenderSystem
+from src.cache import cache_from_config
+from src.schema import RequestSchema, ValidationError, merge_batch_results
+from src import metrics
 
 app = Flask(__name__, static_folder='frontend/dist', static_url_path='')
 CORS(app)
-recommender = RecommenderSystem()
+
+# RECOMMENDER_INIT controls when the model, pandas and price tables are loaded:
+#   'lazy'    (default) on the first recommendation request
+#   'eager'   at import time
+#   'preload' at import time plus a warm-up run and gc.freeze(), for servers that
+#             import the app once and then fork workers (gunicorn --preload), so
+#             every worker shares the parent's copy of the model and price tables
+INIT_MODE = os.environ.get('RECOMMENDER_INIT', 'lazy')
+_recommender = None
+_recommender_lock = threading.Lock()
+
+def get_recommender():
+    global _recommender
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                from src.model_manager import ModelManager
+                from src.recommender import RecommenderSystem
+                # RECOMMENDATION_CACHE: 'local' (default), 'sqlite[:path]' to share across workers, or 'off'
+                recommender = RecommenderSystem(
+                    cache=cache_from_config(os.environ.get('RECOMMENDATION_CACHE', 'local')),
+                    engine=os.environ.get('MODEL_ENGINE', 'auto'),
+                    # FERTILIZER_MODE: 'greedy' (DAP -> Urea -> MOP) or 'least_cost' (cheapest mix of all products)
+                    fertilizer_mode=os.environ.get('FERTILIZER_MODE', 'greedy'),
+                    # FERTILIZER_PRICES: optional District,Fertilizer,Price_per_kg CSV of local prices
+                    fertilizer_prices=os.environ.get('FERTILIZER_PRICES'),
+                    # RANKING: 'blend' (model top 3 + market score) or 'multi' (all crops on calibrated
+                    # probability, expected revenue and fertilizer cost, weighted by RANKING_WEIGHTS)
+                    ranking=os.environ.get('RANKING', 'blend'),
+                    ranking_options=ranking_options(),
+                    drift_monitor=get_drift_monitor()
+                )
+                # New registry versions are picked up every MODEL_RELOAD_SECONDS (0 turns it off);
+                # a registry CANDIDATE gets its share of traffic (see src/model_manager.py)
+                _recommender = ModelManager(
+                    recommender,
+                    registry_dir=os.environ.get('MODEL_REGISTRY', 'models/registry'),
+                    interval=float(os.environ.get('MODEL_RELOAD_SECONDS', 10)),
+                    min_accuracy=float(os.environ.get('MODEL_MIN_ACCURACY', 0))
+                )
+    return _recommender
+
+def ranking_options():
+    """RankingEngine settings from RANKING_WEIGHTS ('suitability=0.6,revenue=0.3,cost=0.1') and RANKING_TOP_K."""
+    from src.ranking import parse_weights
+    return {'weights': parse_weights(os.environ.get('RANKING_WEIGHTS')),
+            'top_k': int(os.environ.get('RANKING_TOP_K', 3))}
+
+_drift_monitor = None
+
+def get_drift_monitor():
+    """
+    Sketches of live inputs compared with the training data every DRIFT_WINDOW_SECONDS
+    (default 3600). DRIFT_MONITOR=off turns it off.
+    """
+    global _drift_monitor
+    if _drift_monitor is None and os.environ.get('DRIFT_MONITOR', 'on') != 'off':
+        from src.drift import DriftMonitor
+        _drift_monitor = DriftMonitor.from_path(
+            window_seconds=float(os.environ.get('DRIFT_WINDOW_SECONDS', 3600)))
+    return _drift_monitor
+
+_schema = None
+
+def get_schema():
+    """Request validator; the district list comes from the same normals table as the weather."""
+    global _schema
+    if _schema is None:
+        _schema = RequestSchema()
+    return _schema
+
+_renderer = None
+
+def get_renderer():
+    """HTML renderer for /recommend: compiled template plus crop-name translations, built once."""
+    global _renderer
+    if _renderer is None:
+        from src.rendering import ResultRenderer
+        _renderer = ResultRenderer(app.jinja_env)
+    return _renderer
+
+def warm_up():
+    """Explicit warm-up hook: loads everything and runs one recommendation."""
+    recommender = get_recommender()
+    recommender.warm_up()
+    get_renderer()
+    return recommender
+
+if INIT_MODE == 'eager':
+    get_recommender()
+elif INIT_MODE == 'preload':
+    warm_up()
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # forked workers do not touch (and copy) the shared pages
+    gc.freeze()
+
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'crop_http_request_seconds', 'HTTP request latency by endpoint.', ['endpoint', 'method', 'status'])
+
+def _cache_samples():
+    cache = _recommender.cache if _recommender is not None else None
+    if cache is None:
+        return {}
+    stats = cache.stats()
+    return {('hits',): stats['hits'], ('misses',): stats['misses'], ('hit_rate',): stats['hit_rate']}
+
+def _model_samples():
+    if _recommender is None:
+        return {}
+    samples = {}
+    for role, recommender in (('active', _recommender.active), ('candidate', _recommender.candidate)):
+        if recommender is not None and recommender.model:
+            samples[(str(recommender.model_version), type(recommender.model).__name__, role)] = 1
+    return samples
+
+def _drift_samples():
+    if _drift_monitor is None:
+        return {}
+    report = _drift_monitor.report()
+    samples = {}
+    for window in ('current_window', 'last_window'):
+        if report[window]:
+            for feature, value in report[window]['psi'].items():
+                samples[(feature, window)] = value
+            samples[('predicted_crop', window)] = report[window]['predicted_crop_psi']
+    return samples
+
+metrics.REGISTRY.gauge_callback('crop_recommendation_cache', 'Recommendation cache counters.', ['stat'], _cache_samples)
+metrics.REGISTRY.gauge_callback('crop_model_info', 'Models currently served.', ['version', 'engine', 'role'], _model_samples)
+metrics.REGISTRY.gauge_callback('crop_drift_psi', 'Population stability index of live inputs vs the training data.',
+                                ['feature', 'window'], _drift_samples)
+
+# Send 'X-Profile: 1' with a request to get its stage breakdown back in a Server-Timing header
+PROFILE_HEADER = 'X-Profile'
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    if request.headers.get(PROFILE_HEADER):
+        g.profile_token = metrics.start_profile()
+
+@app.after_request
+def _record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(elapsed, request.endpoint or 'unknown', request.method, str(response.status_code))
+        token = g.pop('profile_token', None)
+        if token is not None:
+            profile = metrics.end_profile(token)
+            profile['total'] = elapsed
+            response.headers['Server-Timing'] = metrics.server_timing(profile)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -12,64 +176,74 @@ def index():
 
 @app.route('/recommend', methods=['POST'])
 def recommend():
-    try:
-        district = request.form.get('district')
-        n = float(request.form.get('n'))
-        p = float(request.form.get('p'))
-        k = float(request.form.get('k'))
-        soil_type = request.form.get('soil_type')
-        
-        # Optional inputs
-        ph = float(request.form.get('ph', 6.5))
-        
-        result = recommender.get_recommendation(district, n, p, k, ph, soil_type)
-        
-        # Tamil Translation Mapping
-        tamil_crops = {
-            'Rice': 'நெல் (Nel)',
-            'Maize': 'மக்காச்சோளம்',
-            'Cotton': 'பருத்தி',
-            'Sugarcane': 'கரும்பு',
-            'Groundnut': 'நிலக்கடலை',
-            'Blackgram': 'உளுந்து',
-            'Coconut': 'தென்னை',
-            'Banana': 'வாழை',
-            'Turmeric': 'மஞ்சள்',
-            'Tapioca': 'மரவள்ளி',
-            'Chickpea': 'கொண்டைக்கடலை',
-            'Kidneybeans': 'காராமணி',
-            'Pigeonpeas': 'துவரை',
-            'Mothbeans': 'நரிப்பயறு',
-            'Mungbean': 'பாசிப்பயறு',
-            'Mango': 'மாம்பழம்',
-            'Grapes': 'திராட்சை',
-            'Watermelon': 'தர்பூசணி',
-            'Muskmelon': 'முலாம்பழம்',
-            'Apple': 'ஆப்பிள்',
-            'Orange': 'ஆரஞ்சு',
-            'Papaya': 'பப்பாளி',
-            'Coffee': 'காபி',
-            'Jute': 'சணல்',
-            'Lentil': 'மைசூர் பருப்பு'
-        }
-        
-        return render_template('result.html', result=result, tamil_crops=tamil_crops)
-        
-    except Exception as e:
-        return jsonify({'error': str(e)})
+    farm = get_schema().parse(request.form.to_dict())
+    result = get_recommender().get_recommendation(**farm)
+    if 'error' in result:
+        # e.g. no model loaded: there is no result page to render
+        return jsonify({'error': result['error']})
+
+    renderer = get_renderer()
+    lang = renderer.pick_language(request.values.get('lang'), request.accept_languages)
+    with metrics.stage('render'):
+        return renderer.render(result, lang)
 
 @app.route('/api/recommend', methods=['POST'])
 def api_recommend():
-    data = request.json
-    result = recommender.get_recommendation(
-        data['district'], 
-        data['n'], 
-        data['p'], 
-        data['k'], 
-        data.get('ph', 6.5), 
-        data.get('soil_type', 'Loamy')
-    )
+    farm = get_schema().parse(request.get_json(silent=True))
+    result = get_recommender().get_recommendation(**farm)
     return jsonify(result)
 
+def parse_batch_rows():
+    """
+    Accepts either a JSON list of farms (or {"farms": [...]}) or a
+    multipart 'file' upload in CSV / JSONL form. CSV stays a DataFrame so it
+    is validated column by column.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        raw = upload.read().decode('utf-8')
+        if upload.filename.lower().endswith(('.jsonl', '.ndjson')):
+            return [json.loads(line) for line in raw.splitlines() if line.strip()]
+        import pandas as pd
+        return pd.read_csv(io.StringIO(raw))
+    data = request.get_json(silent=True)
+    rows = data.get('farms', []) if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValidationError({'farms': 'expected a list of farms'})
+    return rows
+
+def recommend_rows(rows, recommender):
+    """Validates a batch, scores the valid rows in one call and reports the rest per row."""
+    farms, errors = get_schema().parse_batch(rows)
+    scored = recommender.get_recommendations_batch([farm for _, farm in farms])
+    results = merge_batch_results(farms, errors, scored)
+    return {'count': len(results), 'rejected': len(errors), 'results': results}
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def api_recommend_batch():
+    return jsonify(recommend_rows(parse_batch_rows(), get_recommender()))
+
+@app.errorhandler(ValidationError)
+def validation_error(e):
+    return jsonify({'error': 'Invalid request', 'fields': e.errors}), 400
+
+@app.route('/api/models')
+def api_models():
+    return jsonify(get_recommender().serving())
+
+@app.route('/api/drift')
+def api_drift():
+    monitor = get_drift_monitor()
+    if monitor is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **monitor.report()})
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    cache = get_recommender().cache
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,121 @@
+# uvicorn asgi:app --workers 4
+#
+# Production ASGI entry point. The hot JSON endpoints are served on the event
+# loop: inference runs on a thread pool, and /api/recommend calls that arrive
+# within MICROBATCH_WAIT_MS of each other are scored with one predict_proba via
+# get_recommendations_batch, which shares its ranking, tie-break and result
+# building with get_recommendation, so responses are byte-identical to the Flask
+# endpoint's. Every other route (form posts, file uploads,
+# /metrics, static files) is handed to the Flask app unchanged.
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.wsgi import WsgiToAsgi
+
+import app as flask_module
+from src.micro_batch import MicroBatcher
+from src.schema import ValidationError
+
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 2))
+MICROBATCH_MAX = int(os.environ.get('MICROBATCH_MAX', 64))
+MICROBATCH_WAIT_MS = float(os.environ.get('MICROBATCH_WAIT_MS', 2))
+
+
+class RecommendationApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.fallback = WsgiToAsgi(flask_app)
+        self.executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix='inference')
+        self.batcher = MicroBatcher(self._score_batch, self.executor,
+                                    max_batch=MICROBATCH_MAX, max_wait=MICROBATCH_WAIT_MS / 1000)
+        self.routes = {
+            ('POST', '/api/recommend'): ('api_recommend', self.recommend),
+            ('POST', '/api/recommend/batch'): ('api_recommend_batch', self.recommend_batch),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        route = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if route is None or not _is_json(scope):
+            return await self.fallback(scope, receive, send)
+
+        endpoint, handler = route
+        start = time.perf_counter()
+        try:
+            data = json.loads(await _read_body(receive) or b'null')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            status, payload = 400, {'error': 'Invalid request', 'fields': {'request': 'body is not valid JSON'}}
+        else:
+            try:
+                status, payload = 200, await handler(data)
+            except ValidationError as e:
+                status, payload = 400, {'error': 'Invalid request', 'fields': e.errors}
+        # Same serialization as jsonify (compact outside debug mode)
+        separators = None if self.flask_app.debug else (',', ':')
+        body = self.flask_app.json.dumps(payload, separators=separators).encode('utf-8') + b'\n'
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode()),
+                                (b'access-control-allow-origin', b'*')]})
+        await send({'type': 'http.response.body', 'body': body})
+        flask_module.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, 'POST', str(status))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Load the model off the event loop before taking traffic
+                await asyncio.get_running_loop().run_in_executor(self.executor, flask_module.get_recommender)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _score_batch(self, farms):
+        return flask_module.get_recommender().get_recommendations_batch(farms, use_cache=True)
+
+    async def recommend(self, data):
+        # Rejected before it can join a batch
+        farm = flask_module.get_schema().parse(data)
+        recommender = flask_module.get_recommender()
+        # Enrichment runs concurrently off the event loop before the farm joins a batch:
+        # live weather is fetched (or joins the in-flight fetch) on the weather pool, and
+        # the market index is checked for new price data (reloading it if needed), so
+        # the batch finds both ready instead of waiting on them in turn
+        loop = asyncio.get_running_loop()
+        enrichment = [loop.run_in_executor(None, recommender.market_service.data_version)]
+        if not recommender.weather_service.mock:
+            enrichment.append(recommender.weather_service.get_weather_async(farm['district']))
+        await asyncio.gather(*enrichment)
+        return await self.batcher.submit(farm)
+
+    async def recommend_batch(self, data):
+        rows = data.get('farms', []) if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValidationError({'farms': 'expected a list of farms'})
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, flask_module.recommend_rows, rows,
+                                          flask_module.get_recommender())
+
+
+def _is_json(scope):
+    for name, value in scope.get('headers', ()):
+        if name == b'content-type':
+            return value.split(b';')[0].strip().lower() == b'application/json'
+    return False
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+app = RecommendationApp(flask_module.app)
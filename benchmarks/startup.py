@@ -0,0 +1,67 @@
+"""
+Cold-start benchmark for app.py.
+
+Each configuration runs in a fresh interpreter and reports how long `import app`
+takes, how long the first /api/recommend request takes after that, and the peak RSS.
+'eager + sklearn' reproduces the original startup (pickle, pandas and sklearn
+loaded at import); the other rows show the lazy and compiled-model modes.
+
+    python benchmarks/startup.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'eager + sklearn': {'RECOMMENDER_INIT': 'eager', 'MODEL_ENGINE': 'sklearn'},
+    'eager + compiled': {'RECOMMENDER_INIT': 'eager', 'MODEL_ENGINE': 'auto'},
+    'lazy + compiled': {'RECOMMENDER_INIT': 'lazy', 'MODEL_ENGINE': 'auto'},
+}
+
+PROBE = """
+import json, resource, time, warnings
+warnings.simplefilter('ignore')
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.post('/api/recommend', json={'district': 'Erode', 'n': 90, 'p': 45, 'k': 40})
+t2 = time.perf_counter()
+print(json.dumps({'import_s': t1 - t0, 'first_request_s': t2 - t1,
+                  'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def run_once(env_overrides):
+    env = dict(os.environ, RECOMMENDATION_CACHE='off', **env_overrides)
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    for name, env in CONFIGS.items():
+        runs = [run_once(env) for _ in range(args.runs)]
+        results[name] = {key: round(statistics.median(run[key] for run in runs), 4) for key in runs[0]}
+        r = results[name]
+        print(f"{name:18s} import {r['import_s'] * 1000:8.1f} ms   first request {r['first_request_s'] * 1000:8.1f} ms"
+              f"   peak RSS {r['max_rss_mb']:6.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Reproducible benchmark suite for the recommendation path.
+
+Measures single-request latency, batch throughput, MarketService and
+FertilizerEngine lookup cost, training-data load (CSV vs memory-mapped cache), HTTP latency/throughput at fixed concurrency
+against a local server, and cold start (see startup.py). Inputs are drawn from
+generate_synthetic_data at fixed seeds, so runs on different commits see the
+same rows. Results are written as JSON for comparison:
+
+    python benchmarks/suite.py --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+warnings.simplefilter('ignore')
+
+from generate_synthetic_data import sample_crop_block  # noqa: E402
+
+SEED = 1234
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p90_ms': round(float(np.percentile(samples, 90)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'mean_ms': round(float(samples.mean()), 4),
+    }
+
+
+def make_farms(n_rows, seed=SEED):
+    """Soil tests drawn from the synthetic crop distribution, spread over all districts."""
+    from src.api_integration import WeatherService
+    rng = np.random.default_rng(seed)
+    df = sample_crop_block(rng, n_rows)
+    districts = WeatherService().districts
+    soils = ['Loamy', 'Clayey', 'Sandy', 'Red', 'Black']
+    return [{'district': districts[i % len(districts)], 'n': float(n), 'p': float(p), 'k': float(k),
+             'ph': float(ph), 'soil_type': soils[i % len(soils)]}
+            for i, (n, p, k, ph) in enumerate(zip(df['N'], df['P'], df['K'], df['ph']))]
+
+
+def bench_single(recommender, farms):
+    # Warm-up so lazily built structures are not timed
+    for farm in farms[:20]:
+        recommender.get_recommendation(**farm)
+    samples = []
+    for farm in farms:
+        start = time.perf_counter()
+        recommender.get_recommendation(**farm)
+        samples.append(time.perf_counter() - start)
+    return dict(requests=len(farms), **percentiles(samples))
+
+
+def bench_batch(recommender, farms, sizes):
+    results = {}
+    for size in sizes:
+        rows = farms[:size]
+        recommender.get_recommendations_batch(rows[:10])
+        start = time.perf_counter()
+        recommender.get_recommendations_batch(rows)
+        elapsed = time.perf_counter() - start
+        results[str(size)] = {'seconds': round(elapsed, 4), 'rows_per_s': round(size / elapsed, 1)}
+    return results
+
+
+def bench_market(market, repeats=20000):
+    crops = sorted({crop for _, crop in market.index.by_pair}) or ['Rice']
+    districts = sorted({district for district, _ in market.index.by_pair}) or ['Erode']
+    pairs = [(crops[i % len(crops)], districts[i % len(districts)]) for i in range(repeats)]
+    start = time.perf_counter()
+    for crop, district in pairs:
+        market.get_price_prediction(crop, district)
+    return {'lookups': repeats, 'us_per_lookup': round((time.perf_counter() - start) / repeats * 1e6, 3)}
+
+
+def bench_fertilizer(engine, farms, crops):
+    start = time.perf_counter()
+    for i, farm in enumerate(farms):
+        engine.recommend(crops[i % len(crops)], {'N': farm['n'], 'P': farm['p'], 'K': farm['k']}, farm['soil_type'])
+    single = (time.perf_counter() - start) / len(farms)
+    batch_crops = [crops[i % len(crops)] for i in range(len(farms))]
+    soil = [[farm['n'], farm['p'], farm['k']] for farm in farms]
+    start = time.perf_counter()
+    engine.recommend_batch(batch_crops, soil, [farm['soil_type'] for farm in farms])
+    batch = (time.perf_counter() - start) / len(farms)
+    return {'calls': len(farms), 'us_per_recommend': round(single * 1e6, 3), 'us_per_row_batch': round(batch * 1e6, 3)}
+
+
+def bench_training_data(model, data_path='crop_recommendation.csv', repeats=5):
+    from src.model_training import load_training_data, as_frame
+    from src.training_cache import load_training_cache
+    load_training_cache(data_path)  # build outside the timings
+
+    def best_of(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    X, y = load_training_data(data_path, use_cache=True)
+    start = time.perf_counter()
+    accuracy = float((model.predict(as_frame(X)) == y).mean())
+    evaluate = time.perf_counter() - start
+    return {
+        'rows': len(X),
+        'csv_load_s': round(best_of(lambda: load_training_data(data_path, use_cache=False)), 4),
+        'cached_load_s': round(best_of(lambda: load_training_data(data_path, use_cache=True)), 4),
+        'evaluate_s': round(evaluate, 4),
+        'accuracy': round(accuracy, 4),
+    }
+
+
+def start_server(kind):
+    """Starts app.py ('flask', threaded werkzeug) or asgi.py ('asgi', uvicorn) locally; returns (port, stop)."""
+    import socket
+    if kind == 'asgi':
+        import uvicorn
+        import asgi
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=port, log_level='warning'))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        return port, lambda: setattr(server, 'should_exit', True)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def bench_http(farms, concurrency, requests_per_worker, server='flask'):
+    """Drives /api/recommend on a local server with a fixed number of client threads."""
+    import requests
+
+    port, stop = start_server(server)
+    url = f"http://127.0.0.1:{port}/api/recommend"
+    requests.post(url, json=farms[0]).raise_for_status()
+
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+
+    def worker(slot):
+        session = requests.Session()
+        for i in range(requests_per_worker):
+            farm = farms[(slot * requests_per_worker + i) % len(farms)]
+            start = time.perf_counter()
+            response = session.post(url, json=farm)
+            latencies[slot].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    stop()
+
+    samples = [s for slot in latencies for s in slot]
+    return dict(server=server, concurrency=concurrency, requests=len(samples), errors=len(errors),
+                requests_per_s=round(len(samples) / elapsed, 1), **percentiles(samples))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    os.environ['RECOMMENDATION_CACHE'] = 'off'
+    from src.recommender import RecommenderSystem
+    import startup
+
+    recommender = RecommenderSystem()
+    farms = make_farms(max(args.sizes))
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'seed': SEED,
+            'model': type(recommender.model).__name__,
+        },
+        'single_request': bench_single(recommender, farms[:args.single_requests]),
+        'batch': bench_batch(recommender, farms, args.sizes),
+        'market_lookup': bench_market(recommender.market_service),
+        'fertilizer': bench_fertilizer(recommender.fertilizer_engine, farms[:10000],
+                                       [str(c) for c in recommender.model.classes_]),
+        'training_data': bench_training_data(recommender.model),
+    }
+    if not args.skip_http:
+        results['http'] = bench_http(farms, args.concurrency, args.http_requests, server=args.server)
+    if not args.skip_startup:
+        results['cold_start'] = {name: startup.run_once(env) for name, env in startup.CONFIGS.items()}
+    return results
+
+
+# Metrics compared by --compare: (path, higher_is_better)
+COMPARED = [
+    (('single_request', 'p50_ms'), False),
+    (('single_request', 'p99_ms'), False),
+    (('market_lookup', 'us_per_lookup'), False),
+    (('fertilizer', 'us_per_recommend'), False),
+    (('training_data', 'cached_load_s'), False),
+    (('http', 'p50_ms'), False),
+    (('http', 'requests_per_s'), True),
+]
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    rows = [(path, better) for path, better in COMPARED]
+    for size in new.get('batch', {}):
+        rows.append((('batch', size, 'rows_per_s'), True))
+
+    regressions = 0
+    for path, higher_is_better in rows:
+        try:
+            a, b = old, new
+            for key in path:
+                a, b = a[key], b[key]
+        except KeyError:
+            continue
+        change = (b - a) / a if a else 0.0
+        worse = change < -threshold if higher_is_better else change > threshold
+        regressions += worse
+        print(f"{'.'.join(path):38s} {a:>12.3f} -> {b:>12.3f}  {change * 100:+7.1f}%{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crop recommendation path.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help="Batch sizes (synthetic rows) to measure")
+    parser.add_argument('--single-requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--http-requests', type=int, default=100, help="Requests per client thread")
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask',
+                        help="Serve the HTTP benchmark from app.py or asgi.py")
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--skip-startup', action='store_true')
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative change flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
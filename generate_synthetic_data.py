@@ -1,107 +1,204 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
-import random
 
 # TNAU (Tamil Nadu Agricultural University) Standard Reference Data
-def generate_crop_data(n_samples=2000):
-    # Crop Profiles: [N_min, N_max, P_min, P_max, K_min, K_max, Temp_min, Temp_max, Hum_min, Hum_max, pH_min, pH_max, Rain_min, Rain_max]
-    crop_profiles = {
-        'Rice':         [120, 150, 40, 60, 40, 60, 22, 32, 70, 90, 5.5, 7.5, 150, 300], # Heavy feeder, high water
-        'Maize':        [80, 100, 40, 60, 30, 50, 20, 30, 50, 70, 5.5, 7.5, 60, 110],
-        'Cotton':       [100, 120, 40, 60, 40, 60, 25, 35, 60, 80, 6.0, 8.0, 50, 100],  # Black soil usually
-        'Sugarcane':    [150, 250, 60, 90, 60, 120, 25, 35, 70, 90, 6.0, 7.5, 150, 250],
-        'Groundnut':    [20, 40, 40, 60, 40, 60, 25, 30, 40, 60, 6.0, 7.5, 50, 100],    # Legume, low N
-        'Blackgram':    [15, 25, 40, 60, 20, 40, 25, 35, 60, 75, 6.0, 7.5, 60, 90],     # Pulses
-        'Coconut':      [50, 80, 40, 60, 80, 120, 25, 30, 70, 90, 5.5, 7.0, 150, 250],  # High K
-        'Banana':       [100, 150, 40, 60, 150, 250, 25, 30, 70, 90, 6.0, 7.5, 150, 250],# High K, Water
-        'Turmeric':     [120, 150, 60, 90, 80, 120, 20, 30, 70, 90, 5.5, 7.5, 150, 250],
-        'Tapioca':      [60, 90, 50, 70, 80, 120, 25, 35, 60, 80, 5.5, 7.0, 80, 150]
-    }
-    
-    data = []
-    
-    for _ in range(n_samples):
-        # Pick a crop based on rough TN production ratios (Rice is dominant)
-        crop_list = list(crop_profiles.keys())
-        weights = [0.3, 0.15, 0.1, 0.1, 0.1, 0.1, 0.05, 0.05, 0.025, 0.025]
-        crop = random.choices(crop_list, weights=weights, k=1)[0]
-        
-        prof = crop_profiles[crop]
-        
-        # Add slight gaussian noise to create realistic variations
-        N = int(np.random.normal(np.mean([prof[0], prof[1]]), (prof[1]-prof[0])/4))
-        P = int(np.random.normal(np.mean([prof[2], prof[3]]), (prof[3]-prof[2])/4))
-        K = int(np.random.normal(np.mean([prof[4], prof[5]]), (prof[5]-prof[4])/4))
-        
-        temp = np.random.normal(np.mean([prof[6], prof[7]]), (prof[7]-prof[6])/4)
-        hum = np.random.normal(np.mean([prof[8], prof[9]]), (prof[9]-prof[8])/4)
-        ph = np.random.normal(np.mean([prof[10], prof[11]]), (prof[11]-prof[10])/4)
-        rain = np.random.normal(np.mean([prof[12], prof[13]]), (prof[13]-prof[12])/4)
-        
-        # Clip values to ensure they aren't negative or wildly off
-        N = max(0, N); P = max(0, P); K = max(0, K)
-        temp = max(10, temp); hum = min(100, max(10, hum))
-        
-        data.append([N, P, K, round(temp,1), round(hum,1), round(ph,1), round(rain,1), crop])
-        
-    df = pd.DataFrame(data, columns=['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall', 'label'])
-    df.to_csv('crop_recommendation.csv', index=False)
-    print("Generated crop_recommendation.csv with TNAU standards.")
-
-def generate_market_data():
-    # Accurate Market Prices (approx. 2024-2025 TN trends in INR per Quintal)
-    # Source: Agmarknet & TNAU Agritech Portal
-    base_prices = {
-        'Rice': 2300,        # MSP is around 2300
-        'Maize': 2200,
-        'Cotton': 7200,      # Long staple
-        'Sugarcane': 3150,   # FRP per tonne -> ~315/quintal? No, sugarcane is per tonne usually. 
-                             # Let's normalize everything to Quintal for the model. 
-                             # Cane is ~3300 per Tonne => 330 per Quintal. 
-                             # Wait, usually cane profit is calculated differently. 
-                             # Let's use 350 per quintal but remember high yield (40 tonnes/acre).
-        'Groundnut': 6500,
-        'Blackgram': 8400,
-        'Coconut': 3000,     # Per 1000 nuts usually, but let's approx to value equivalence per quintal of copra ~ 9000
-        'Banana': 2000,      # Highly variable
-        'Turmeric': 9000,
-        'Tapioca': 1200      # Starch content based
-    }
-    
-    districts = [
-        'Ariyalur', 'Chengalpattu', 'Chennai', 'Coimbatore', 'Cuddalore', 'Dharmapuri', 
-        'Dindigul', 'Erode', 'Kallakurichi', 'Kancheepuram', 'Karur', 'Krishnagiri', 
-        'Madurai', 'Mayiladuthurai', 'Nagapattinam', 'Namakkal', 'Nilgiris', 'Perambalur', 
-        'Pudukkottai', 'Ramanathapuram', 'Ranipet', 'Salem', 'Sivaganga', 'Tenkasi', 
-        'Thanjavur', 'Theni', 'Thoothukudi', 'Tiruchirappalli', 'Tirunelveli', 'Tirupattur', 
-        'Tiruppur', 'Tiruvallur', 'Tiruvannamalai', 'Tiruvarur', 'Vellore', 'Viluppuram', 
-        'Virudhunagar'
-    ]
-    
-    data = []
-    
-    # Generate historical price trends
-    for dist in districts:
-        for crop, price in base_prices.items():
-            # Add regional variation
-            if dist == 'Erode' and crop == 'Turmeric':
-                local_price = price * 1.1 # Erode is Turmeric hub
-            elif dist == 'Thanjavur' and crop == 'Rice':
-                local_price = price * 1.05 # Rice bowl
-            elif dist == 'Coimbatore' and crop == 'Cotton':
-                local_price = price * 1.05
-            else:
-                local_price = price
-                
-            # Random daily fluctuation
-            final_price = int(np.random.normal(local_price, local_price*0.05))
-            
-            data.append([dist, crop, '2025-01-08', final_price])
-            
-    df = pd.DataFrame(data, columns=['District', 'Commodity', 'Date', 'Modal_Price'])
-    df.to_csv('market_prices.csv', index=False)
-    print("Generated market_prices.csv with realistic TN market data.")
+# Crop Profiles: [N_min, N_max, P_min, P_max, K_min, K_max, Temp_min, Temp_max, Hum_min, Hum_max, pH_min, pH_max, Rain_min, Rain_max]
+CROP_PROFILES = {
+    'Rice':         [120, 150, 40, 60, 40, 60, 22, 32, 70, 90, 5.5, 7.5, 150, 300], # Heavy feeder, high water
+    'Maize':        [80, 100, 40, 60, 30, 50, 20, 30, 50, 70, 5.5, 7.5, 60, 110],
+    'Cotton':       [100, 120, 40, 60, 40, 60, 25, 35, 60, 80, 6.0, 8.0, 50, 100],  # Black soil usually
+    'Sugarcane':    [150, 250, 60, 90, 60, 120, 25, 35, 70, 90, 6.0, 7.5, 150, 250],
+    'Groundnut':    [20, 40, 40, 60, 40, 60, 25, 30, 40, 60, 6.0, 7.5, 50, 100],    # Legume, low N
+    'Blackgram':    [15, 25, 40, 60, 20, 40, 25, 35, 60, 75, 6.0, 7.5, 60, 90],     # Pulses
+    'Coconut':      [50, 80, 40, 60, 80, 120, 25, 30, 70, 90, 5.5, 7.0, 150, 250],  # High K
+    'Banana':       [100, 150, 40, 60, 150, 250, 25, 30, 70, 90, 6.0, 7.5, 150, 250],# High K, Water
+    'Turmeric':     [120, 150, 60, 90, 80, 120, 20, 30, 70, 90, 5.5, 7.5, 150, 250],
+    'Tapioca':      [60, 90, 50, 70, 80, 120, 25, 35, 60, 80, 5.5, 7.0, 80, 150]
+}
+# Rough TN production ratios (Rice is dominant)
+CROP_WEIGHTS = [0.3, 0.15, 0.1, 0.1, 0.1, 0.1, 0.05, 0.05, 0.025, 0.025]
+CROP_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall', 'label']
+
+# Accurate Market Prices (approx. 2024-2025 TN trends in INR per Quintal)
+# Source: Agmarknet & TNAU Agritech Portal
+BASE_PRICES = {
+    'Rice': 2300,        # MSP is around 2300
+    'Maize': 2200,
+    'Cotton': 7200,      # Long staple
+    'Sugarcane': 3150,   # FRP per tonne -> ~315/quintal? No, sugarcane is per tonne usually.
+                         # Let's normalize everything to Quintal for the model.
+                         # Cane is ~3300 per Tonne => 330 per Quintal.
+                         # Wait, usually cane profit is calculated differently.
+                         # Let's use 350 per quintal but remember high yield (40 tonnes/acre).
+    'Groundnut': 6500,
+    'Blackgram': 8400,
+    'Coconut': 3000,     # Per 1000 nuts usually, but let's approx to value equivalence per quintal of copra ~ 9000
+    'Banana': 2000,      # Highly variable
+    'Turmeric': 9000,
+    'Tapioca': 1200      # Starch content based
+}
+
+# Regional variation: (district, crop) -> price multiplier
+REGIONAL_PREMIUMS = {
+    ('Erode', 'Turmeric'): 1.1,     # Erode is Turmeric hub
+    ('Thanjavur', 'Rice'): 1.05,    # Rice bowl
+    ('Coimbatore', 'Cotton'): 1.05,
+}
+
+DISTRICTS = [
+    'Ariyalur', 'Chengalpattu', 'Chennai', 'Coimbatore', 'Cuddalore', 'Dharmapuri',
+    'Dindigul', 'Erode', 'Kallakurichi', 'Kancheepuram', 'Karur', 'Krishnagiri',
+    'Madurai', 'Mayiladuthurai', 'Nagapattinam', 'Namakkal', 'Nilgiris', 'Perambalur',
+    'Pudukkottai', 'Ramanathapuram', 'Ranipet', 'Salem', 'Sivaganga', 'Tenkasi',
+    'Thanjavur', 'Theni', 'Thoothukudi', 'Tiruchirappalli', 'Tirunelveli', 'Tirupattur',
+    'Tiruppur', 'Tiruvallur', 'Tiruvannamalai', 'Tiruvarur', 'Vellore', 'Viluppuram',
+    'Virudhunagar'
+]
+MARKET_COLUMNS = ['District', 'Commodity', 'Date', 'Modal_Price']
+
+# Day-to-day persistence of market prices (AR(1) coefficient of the deviation
+# from the local price). Each day's marginal spread stays at 5% of the local price.
+PRICE_PERSISTENCE = 0.97
+PRICE_SPREAD = 0.05
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to a CSV or Parquet file without holding the whole table."""
+    def __init__(self, path, fmt='csv'):
+        self.path = path
+        self.fmt = fmt
+        self._parquet = None
+        self._first = True
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='a', header=self._first, index=False)
+        elif self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            raise ValueError(f"Unsupported format: {self.fmt}")
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def sample_crop_block(rng, n_samples):
+    """Draws n_samples rows as a DataFrame, sampling each crop's rows as one block."""
+    crops = list(CROP_PROFILES.keys())
+    profiles = np.array([CROP_PROFILES[c] for c in crops], dtype=float)
+    lows, highs = profiles[:, 0::2], profiles[:, 1::2]
+    # Gaussian centred on the range midpoint with a quarter of the range as spread
+    means = (lows + highs) / 2
+    stds = (highs - lows) / 4
+
+    counts = rng.multinomial(n_samples, CROP_WEIGHTS)
+    labels = np.repeat(np.arange(len(crops)), counts)
+    values = np.empty((n_samples, profiles.shape[1] // 2))
+    start = 0
+    for crop_idx, count in enumerate(counts):
+        values[start:start + count] = rng.normal(means[crop_idx], stds[crop_idx], size=(count, values.shape[1]))
+        start += count
+
+    # Interleave crops as the per-sample draw did
+    order = rng.permutation(n_samples)
+    values, labels = values[order], labels[order]
+
+    # Clip values to ensure they aren't negative or wildly off
+    npk = np.maximum(np.trunc(values[:, :3]), 0).astype(np.int64)
+    temp = np.round(np.maximum(values[:, 3], 10), 1)
+    hum = np.round(np.clip(values[:, 4], 10, 100), 1)
+    ph = np.round(values[:, 5], 1)
+    rain = np.round(values[:, 6], 1)
+
+    return pd.DataFrame({
+        'N': npk[:, 0], 'P': npk[:, 1], 'K': npk[:, 2],
+        'temperature': temp, 'humidity': hum, 'ph': ph, 'rainfall': rain,
+        'label': np.array(crops, dtype=object)[labels],
+    }, columns=CROP_COLUMNS)
+
+
+def generate_crop_data(n_samples=2000, seed=None, output='crop_recommendation.csv', fmt='csv',
+                       chunk_size=1_000_000):
+    rng = np.random.default_rng(seed)
+    writer = ChunkWriter(output, fmt)
+    for start in range(0, n_samples, chunk_size):
+        writer.write(sample_crop_block(rng, min(chunk_size, n_samples - start)))
+    writer.close()
+    print(f"Generated {output} ({n_samples} rows) with TNAU standards.")
+
+
+def generate_market_data(days=1, end_date='2025-01-08', seed=None, output='market_prices.csv', fmt='csv',
+                         chunk_days=365):
+    """
+    Writes `days` days of prices ending at end_date for every district and crop.
+    Prices follow a mean-reverting walk around each district's local price.
+    """
+    rng = np.random.default_rng(seed)
+    crops = list(BASE_PRICES.keys())
+    local_prices = np.array([[BASE_PRICES[c] * REGIONAL_PREMIUMS.get((d, c), 1.0) for c in crops]
+                             for d in DISTRICTS]).ravel()
+    district_col = np.repeat(np.array(DISTRICTS, dtype=object), len(crops))
+    crop_col = np.tile(np.array(crops, dtype=object), len(DISTRICTS))
+
+    dates = np.datetime64(end_date, 'D') - np.arange(days - 1, -1, -1)
+    innovation = np.sqrt(1 - PRICE_PERSISTENCE ** 2)
+    deviation = rng.standard_normal(len(local_prices))
+
+    writer = ChunkWriter(output, fmt)
+    for start in range(0, days, chunk_days):
+        block_dates = dates[start:start + chunk_days]
+        block = np.empty((len(block_dates), len(local_prices)))
+        for i in range(len(block_dates)):
+            if start + i > 0:
+                deviation = PRICE_PERSISTENCE * deviation + innovation * rng.standard_normal(len(local_prices))
+            block[i] = deviation
+        # Random daily fluctuation
+        prices = (local_prices * (1 + PRICE_SPREAD * block)).astype(np.int64)
+        writer.write(pd.DataFrame({
+            'District': np.tile(district_col, len(block_dates)),
+            'Commodity': np.tile(crop_col, len(block_dates)),
+            'Date': np.repeat(block_dates.astype(str), len(local_prices)),
+            'Modal_Price': prices.ravel(),
+        }, columns=MARKET_COLUMNS))
+    writer.close()
+    print(f"Generated {output} ({days} day(s), {days * len(local_prices)} rows) with realistic TN market data.")
+
 
 if __name__ == "__main__":
-    generate_crop_data()
-    generate_market_data()
+    parser = argparse.ArgumentParser(description="Generate synthetic crop and market datasets.")
+    parser.add_argument('--only', choices=['crop', 'market'], help="Generate just one of the datasets")
+    parser.add_argument('--rows', type=int, default=2000, help="Crop samples to generate")
+    parser.add_argument('--days', type=int, default=1, help="Days of market price history")
+    parser.add_argument('--end-date', default='2025-01-08')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Output format; parquet needs the optional pyarrow package (pip install pyarrow)")
+    parser.add_argument('--crop-output')
+    parser.add_argument('--market-output')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    args = parser.parse_args()
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow, which is not installed (pip install pyarrow)")
+
+    ext = 'parquet' if args.format == 'parquet' else 'csv'
+    if args.only in (None, 'crop'):
+        generate_crop_data(args.rows, seed=args.seed, output=args.crop_output or f'crop_recommendation.{ext}',
+                           fmt=args.format, chunk_size=args.chunk_size)
+    if args.only in (None, 'market'):
+        market_seed = None if args.seed is None else args.seed + 1
+        generate_market_data(args.days, end_date=args.end_date, seed=market_seed,
+                             output=args.market_output or f'market_prices.{ext}', fmt=args.format)
@@ -0,0 +1,13 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# Loads the model and price tables once in the master process, then forks the
+# workers so they share those pages instead of each loading their own copy.
+import os
+
+os.environ.setdefault('RECOMMENDER_INIT', 'preload')
+# A per-process cache would be cold in every worker; share one on disk instead
+os.environ.setdefault('RECOMMENDATION_CACHE', 'sqlite:models/recommendation_cache.sqlite')
+
+bind = '0.0.0.0:5000'
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = True
@@ -1,11 +1,123 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
 import requests
-import random
+from requests.adapters import HTTPAdapter
+
+# Used for districts missing from the normals table
+DEFAULT_NORMALS = (30.0, 70.0, 900.0)
+
+# Tamil Nadu seasonal profile (Jan..Dec): offsets from the annual normal.
+# Hot dry summer peaks in May; the North-East monsoon makes Oct-Dec humid.
+MONTHLY_TEMP_OFFSET = np.array([-3.0, -1.5, 1.0, 2.5, 3.0, 2.0, 1.0, 1.0, 0.5, -0.5, -2.0, -3.0])
+MONTHLY_HUM_OFFSET = np.array([3.0, -2.0, -5.0, -5.0, -6.0, -3.0, -2.0, -1.0, 0.0, 5.0, 8.0, 6.0])
+
+# Half-widths of the optional 'seeded' daily variation: temperature, humidity, rainfall
+VARIATION_SPREAD = np.array([2.0, 5.0, 50.0])
+
+def load_weather_normals(path='weather_normals.csv'):
+    """
+    Loads IMD historical climate normals per district.
+    Returns (district -> id, float array [n_districts, 3] of temperature, humidity, rainfall).
+    """
+    import csv
+    district_ids = {}
+    values = []
+    if os.path.exists(path):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                district_ids[row['District']] = len(values)
+                values.append((float(row['Temperature']), float(row['Humidity']), float(row['Rainfall'])))
+    return district_ids, np.array(values, dtype=float).reshape(-1, 3)
 
 class WeatherService:
-    def __init__(self, api_key=None, mock=True):
+    def __init__(self, api_key=None, mock=True, base_url="https://api.openweathermap.org/data/2.5/weather",
+                 timeout=5.0, cache_ttl=1800, max_connections=16,
+                 normals_path='weather_normals.csv', variation=None, seed=0):
+        """
+        variation: None    -> district normals as-is (deterministic, cacheable)
+                   'seeded'  -> normals plus a fixed per-district jitter drawn from `seed`
+                   'monthly' -> normals shifted by the current month's seasonal offset
+        """
         self.api_key = api_key
         self.mock = mock
-        self.base_url = "https://api.openweathermap.org/data/2.5/weather"
+        self.variation = variation
+        self.seed = seed
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.max_connections = max_connections
+        self._session = None
+        self._executor = None
+        self._cache = {}      # city -> (expires_at, weather)
+        self._inflight = {}   # city -> Future shared by concurrent callers
+        self._lock = threading.Lock()
+
+        # Indian Meteorological Department (IMD) Historical Averages for TN Districts (Approx)
+        # The last row holds the defaults, so unknown districts map to id -1.
+        self._district_ids, normals = load_weather_normals(normals_path)
+        self.normals = np.vstack([normals, DEFAULT_NORMALS])
+        if variation == 'seeded':
+            rng = np.random.default_rng(seed)
+            jitter = rng.uniform(-1, 1, size=(len(normals), 3)) * VARIATION_SPREAD
+            self.normals[:-1] += jitter
+
+    @property
+    def districts(self):
+        return list(self._district_ids)
+
+    def static_version(self):
+        """
+        Digest of the weather values served, or None when they change over time
+        (live API or 'monthly' variation). Precomputed tables built against one
+        version are valid only while it stays the same.
+        """
+        if not self.mock or self.variation == 'monthly':
+            return None
+        import hashlib
+        digest = hashlib.sha1(np.ascontiguousarray(self.normals).tobytes())
+        digest.update('|'.join(self._district_ids).encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def _seasonal_offset(self):
+        if self.variation != 'monthly':
+            return None
+        month = time.localtime().tm_mon - 1
+        return np.array([MONTHLY_TEMP_OFFSET[month], MONTHLY_HUM_OFFSET[month], 0.0])
+
+    def _normals_row(self, district_id):
+        row = self.normals[district_id]
+        offset = self._seasonal_offset()
+        if offset is not None:
+            row = row + offset
+        return [float(v) for v in row]
+
+    def get_weather_many(self, districts, fallback=None):
+        """
+        Bulk lookup for batch inference.
+        Returns a float array [len(districts), 3] of temperature, humidity, rainfall.
+        Rows whose live lookup fails are filled from `fallback` (a 3-tuple) or NaN.
+        """
+        if self.mock:
+            ids = np.fromiter((self._district_ids.get(d, -1) for d in districts), dtype=np.intp,
+                              count=len(districts))
+            block = self.normals[ids]
+            offset = self._seasonal_offset()
+            if offset is not None:
+                block = block + offset
+            return block
+
+        unique = list(dict.fromkeys(districts))
+        fetched = dict(zip(unique, self._pool().map(self.get_weather, unique)))
+        missing = fallback if fallback is not None else (np.nan, np.nan, np.nan)
+        rows = {}
+        for district, weather in fetched.items():
+            rows[district] = ((weather['temperature'], weather['humidity'], weather['rainfall'])
+                              if weather else missing)
+        return np.array([rows[d] for d in districts], dtype=float).reshape(-1, 3)
 
     def get_weather(self, city):
         """
@@ -16,63 +128,98 @@ class WeatherService:
         }
         """
         if self.mock:
-            # Indian Meteorological Department (IMD) Historical Averages for TN Districts (Approx)
-            tn_weather_normals = {
-                'Ariyalur':     {'temp': 32, 'hum': 60, 'rain': 900},
-                'Chengalpattu': {'temp': 30, 'hum': 75, 'rain': 1200},
-                'Chennai':      {'temp': 32, 'hum': 80, 'rain': 1400},
-                'Coimbatore':   {'temp': 29, 'hum': 60, 'rain': 600},
-                'Cuddalore':    {'temp': 31, 'hum': 75, 'rain': 1300},
-                'Dharmapuri':   {'temp': 28, 'hum': 55, 'rain': 850},
-                'Dindigul':     {'temp': 30, 'hum': 55, 'rain': 800},
-                'Erode':        {'temp': 33, 'hum': 50, 'rain': 700},
-                'Kallakurichi': {'temp': 32, 'hum': 60, 'rain': 950},
-                'Kancheepuram': {'temp': 32, 'hum': 70, 'rain': 1100},
-                'Karur':        {'temp': 34, 'hum': 50, 'rain': 650},
-                'Krishnagiri':  {'temp': 28, 'hum': 60, 'rain': 850},
-                'Madurai':      {'temp': 34, 'hum': 50, 'rain': 850},
-                'Mayiladuthurai':{'temp': 31, 'hum': 75, 'rain': 1200},
-                'Nagapattinam': {'temp': 31, 'hum': 80, 'rain': 1300},
-                'Namakkal':     {'temp': 33, 'hum': 55, 'rain': 750},
-                'Nilgiris':     {'temp': 18, 'hum': 80, 'rain': 1800}, # Hill station
-                'Perambalur':   {'temp': 33, 'hum': 55, 'rain': 900},
-                'Pudukkottai':  {'temp': 32, 'hum': 60, 'rain': 900},
-                'Ramanathapuram':{'temp': 33, 'hum': 65, 'rain': 800}, # Coastal but dry
-                'Ranipet':      {'temp': 33, 'hum': 60, 'rain': 950},
-                'Salem':        {'temp': 32, 'hum': 55, 'rain': 900},
-                'Sivaganga':    {'temp': 33, 'hum': 55, 'rain': 850},
-                'Tenkasi':      {'temp': 30, 'hum': 65, 'rain': 1000},
-                'Thanjavur':    {'temp': 31, 'hum': 75, 'rain': 1100},
-                'Theni':        {'temp': 30, 'hum': 65, 'rain': 900},
-                'Thoothukudi':  {'temp': 31, 'hum': 70, 'rain': 600},
-                'Tiruchirappalli':{'temp': 34, 'hum': 50, 'rain': 800},
-                'Tirunelveli':  {'temp': 32, 'hum': 65, 'rain': 800},
-                'Tirupattur':   {'temp': 30, 'hum': 60, 'rain': 900},
-                'Tiruppur':     {'temp': 31, 'hum': 50, 'rain': 600},
-                'Tiruvallur':   {'temp': 32, 'hum': 75, 'rain': 1100},
-                'Tiruvannamalai':{'temp': 31, 'hum': 60, 'rain': 1000},
-                'Tiruvarur':    {'temp': 31, 'hum': 75, 'rain': 1200},
-                'Vellore':      {'temp': 33, 'hum': 60, 'rain': 900},
-                'Viluppuram':   {'temp': 32, 'hum': 65, 'rain': 1000},
-                'Virudhunagar': {'temp': 34, 'hum': 50, 'rain': 750},
-            }
-            
-            defaults = tn_weather_normals.get(city, {'temp': 30, 'hum': 70, 'rain': 900})
-            
-            # Add slight daily variation
-            return {
-                'temperature': defaults['temp'] + random.uniform(-2, 2),
-                'humidity':    defaults['hum'] + random.uniform(-5, 5),
-                'rainfall':    defaults['rain'] + random.uniform(-50, 50) # Seasonal expectation
-            }
-        
+            row = self._normals_row(self._district_ids.get(city, -1))
+            return {'temperature': row[0], 'humidity': row[1], 'rainfall': row[2]}
+
+        return self._get_live(city)
+
+    @property
+    def session(self):
+        # One pooled session per service, so keep-alive connections are reused across requests
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.max_connections, pool_maxsize=self.max_connections)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _get_live(self, city):
+        """
+        TTL-cached, coalesced live lookup: while one caller is fetching a district,
+        other callers for the same district wait on that fetch instead of starting their own.
+        """
+        with self._lock:
+            cached = self._cache.get(city)
+            if cached is not None and cached[0] > time.monotonic():
+                return dict(cached[1])
+            future = self._inflight.get(city)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[city] = future
+
+        if not is_owner:
+            weather = future.result()
+            return dict(weather) if weather else None
+
+        weather = None
+        try:
+            weather = self._fetch(city)
+        finally:
+            with self._lock:
+                if weather is not None:
+                    self._cache[city] = (time.monotonic() + self.cache_ttl, weather)
+                del self._inflight[city]
+            future.set_result(weather)
+        return dict(weather) if weather else None
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_connections,
+                                                        thread_name_prefix='weather')
+        return self._executor
+
+    async def get_weather_async(self, city):
+        """Runs get_weather on the service's worker pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), self.get_weather, city)
+
+    async def prefetch_async(self, cities):
+        """Fetches all cities in parallel. Returns {city: weather or None}."""
+        results = await asyncio.gather(*(self.get_weather_async(city) for city in cities))
+        return dict(zip(cities, results))
+
+    def prefetch(self, cities):
+        """
+        Fetches all cities in parallel, e.g. for a warm-up hook at startup.
+        Without a running event loop this blocks and returns {city: weather or None}.
+        Called from inside one (e.g. the ASGI app) it schedules prefetch_async on that
+        loop instead and returns the task; await it for the same dict.
+        """
+        cities = list(cities)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return dict(zip(cities, self._pool().map(self.get_weather, cities)))
+        return loop.create_task(self.prefetch_async(cities))
+
+    def _fetch(self, city):
         try:
             params = {
                 'q': city,
                 'appid': self.api_key,
                 'units': 'metric'
             }
-            response = requests.get(self.base_url, params=params)
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
             data = response.json()
             
             if response.status_code == 200:
@@ -85,9 +232,8 @@ class WeatherService:
                 # Fallback to historical normal if specific rain data is missing.
                 rain = data.get('rain', {}).get('1h', 0) * 24 * 30 * 4 # Rough projection if raining now
                 if rain == 0:
-                     # Fallback to a district average if it's a known TN district
-                     tn_weather_normals = {'Coimbatore': 600, 'Thanjavur': 1100, 'Chennai': 1400}
-                     rain = tn_weather_normals.get(city, 900)
+                     # Fallback to the district's seasonal rainfall normal
+                     rain = self._normals_row(self._district_ids.get(city, -1))[2]
                 
                 return {
                     'temperature': temp,
@@ -101,52 +247,178 @@ class WeatherService:
             print(f"Exception in WeatherService: {e}")
             return None
 
+DEFAULT_PRICE = 2000
+
+# Profitability score for each trend, whichever signal the trend came from
+TREND_SCORES = {'up': 90, 'stable': 70, 'down': 40}
+
+def price_outlook(price):
+    """
+    Maps a modal price to (trend, profitability_score).
+    High price = Up-trend (simplified logic for demo)
+    """
+    if price > 5000:
+        trend = 'up'
+    elif price > 2500:
+        trend = 'stable'
+    else:
+        trend = 'down'
+    return trend, TREND_SCORES[trend]
+
+# Momentum (7-day avg vs 30-day avg) beyond which a price series counts as trending
+TREND_THRESHOLD = 0.02
+
+def market_info(price, momentum=0.0, volatility=0.0, n_obs=1):
+    """
+    Builds the market info dict from precomputed trend features. Trend and score
+    both come from momentum, so a label always means the same score; the price
+    level is still reported as current_price. Series with a single observation
+    fall back to the price-level buckets.
+    """
+    trend, score = price_outlook(price)
+    if n_obs >= 2:
+        if momentum > TREND_THRESHOLD:
+            trend = 'up'
+        elif momentum < -TREND_THRESHOLD:
+            trend = 'down'
+        else:
+            trend = 'stable'
+        score = TREND_SCORES[trend]
+    return {
+        'current_price': price,
+        'trend': trend,
+        'profitability_score': score,
+        'momentum': round(momentum, 4),
+        'volatility': round(volatility, 4)
+    }
+
+class PriceIndex:
+    """
+    Immutable snapshot of the price trend features keyed for O(1) lookups.
+    by_pair:  (district, commodity) -> market info
+    by_crop:  commodity -> state-average market info (fallback)
+    """
+    def __init__(self, by_pair, by_crop, version):
+        self.by_pair = by_pair
+        self.by_crop = by_crop
+        self.version = version
+
+    @classmethod
+    def empty(cls):
+        return cls({}, {}, None)
+
+    @classmethod
+    def from_store(cls, store, version=None):
+        by_pair = {}
+        crop_totals = {}
+        for district, crop, feat in store.feature_rows():
+            by_pair[(district, crop)] = market_info(int(round(feat['latest_price'])), feat['momentum'],
+                                                    feat['volatility'], feat['n_obs'])
+            totals = crop_totals.setdefault(crop, [0.0, 0.0, 0.0, 0, 0])
+            totals[0] += feat['latest_price']
+            totals[1] += feat['momentum']
+            totals[2] += feat['volatility']
+            totals[3] += 1
+            totals[4] = max(totals[4], feat['n_obs'])
+
+        # State average for each crop
+        by_crop = {
+            crop: market_info(int(price / count), momentum / count, volatility / count, n_obs)
+            for crop, (price, momentum, volatility, count, n_obs) in crop_totals.items()
+        }
+        return cls(by_pair, by_crop, version)
+
+    def lookup(self, crop, district):
+        info = self.by_pair.get((district, crop)) or self.by_crop.get(crop)
+        if info is None:
+            return None
+        return dict(info)
+
 class MarketService:
-    def __init__(self, api_key=None, mock=True):
+    def __init__(self, api_key=None, mock=True, csv_path='market_prices.csv',
+                 store_path='data/price_store', reload_interval=5.0):
         self.api_key = api_key
         self.mock = mock
+        self.csv_path = csv_path
+        self.store_path = store_path
+        self.reload_interval = reload_interval
         self.prices_df = None
+        self.index = PriceIndex.empty()
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
         # Try to load local realistic database
+        self.load_prices()
+
+    def _source_version(self):
+        from .price_store import PriceStore
+        store_version = PriceStore.version_of(self.store_path)
+        if store_version is not None:
+            return 'store-' + store_version
         try:
-            import pandas as pd
-            import os
-            if os.path.exists('market_prices.csv'):
-                self.prices_df = pd.read_csv('market_prices.csv')
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return f"csv-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def load_prices(self):
+        """
+        (Re)builds the price index. A columnar price store (see src/price_store.py)
+        is preferred when present; otherwise the CSV is loaded into an in-memory one.
+        The new index is built off to the side and swapped in with a single
+        assignment, so readers never see a partial one.
+        """
+        version = self._source_version()
+        if version is None:
+            return
+        try:
+            from .price_store import PriceStore
+            if version.startswith('store-'):
+                store = PriceStore(self.store_path)
+                df = None
+            else:
+                import pandas as pd
+                df = pd.read_csv(self.csv_path)
+                store = PriceStore()
+                store.ingest(df)
+            index = PriceIndex.from_store(store, version)
         except Exception as e:
-            print(f"Could not load market CSV: {e}")
+            print(f"Could not load market prices: {e}")
+            return
+        self.prices_df = df
+        self.index = index
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        # Only one caller checks the source; the rest keep serving the current index
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_check = now
+            version = self._source_version()
+            if version is not None and version != self.index.version:
+                self.load_prices()
+        finally:
+            self._reload_lock.release()
+
+    def data_version(self):
+        """Version of the price data currently served (changes when the source is reloaded)."""
+        if self.mock:
+            self._maybe_reload()
+        return self.index.version
 
     def get_price_prediction(self, crop, district):
         """
         Returns predicted profitability score (0-100) and price.
         """
-        price = 2000 # Default fallback
-        
-        if self.mock and self.prices_df is not None:
-            # Lookup specific district-crop price
-            subset = self.prices_df[
-                (self.prices_df['District'] == district) & 
-                (self.prices_df['Commodity'] == crop)
-            ]
-            
-            if not subset.empty:
-                price = int(subset.iloc[0]['Modal_Price'])
-            else:
-                # Fallback to state average for that crop
-                crop_subset = self.prices_df[self.prices_df['Commodity'] == crop]
-                if not crop_subset.empty:
-                    price = int(crop_subset['Modal_Price'].mean())
-
-        # Determine Mock Trend based on price
-        # High price = Up-trend (simplified logic for demo)
-        if price > 5000:
-            trend = 'up'
-            profitability_score = 90
-        elif price > 2500:
-            trend = 'stable'
-            profitability_score = 70
-        else:
-            trend = 'down'
-            profitability_score = 40
+        if self.mock:
+            self._maybe_reload()
+            info = self.index.lookup(crop, district)
+            if info is not None:
+                return info
+
+        price = DEFAULT_PRICE # Default fallback
             
         # ------------------------------------------------------------------
         # REAL LIVE DATA IMPLEMENTATION (Requires API Key)
@@ -171,8 +443,5 @@ class MarketService:
         #     print(f"Real API failed: {e}")
         # ------------------------------------------------------------------
             
-        return {
-            'current_price': price,
-            'trend': trend,
-            'profitability_score': profitability_score
-        }
+        # Same keys as the price index (no history, so no momentum or volatility)
+        return market_info(price)
@@ -0,0 +1,214 @@
+"""
+Streaming bulk scorer for large soil-test exports (e.g. Soil Health Card dumps).
+
+    python -m src.bulk_scoring farms.csv recommendations.jsonl --workers 4
+
+Reads CSV or JSONL input in chunks, scores each chunk with
+RecommenderSystem.get_recommendations_batch on a pool of worker processes and
+streams the results, in input order, to a JSONL (full results) or CSV (one
+summary line per farm) file. At most `workers * 2` chunks are in memory at a
+time. After every written chunk a checkpoint records how far the run got; run
+the same command again to resume an interrupted job.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .schema import RequestSchema, merge_batch_results
+
+CSV_OUTPUT_COLUMNS = ['row', 'district', 'best_crop', 'top_crops', 'fertilizer', 'total_cost', 'error']
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+
+def is_jsonl(path):
+    return path.lower().endswith(('.jsonl', '.ndjson'))
+
+
+def read_chunks(path, chunk_size, skip_rows=0):
+    """
+    Yields chunk_size rows at a time, after skipping skip_rows: DataFrames for CSV
+    (validated column by column) and lists of dicts for JSONL.
+    """
+    if is_jsonl(path):
+        with open(path) as f:
+            chunk = []
+            seen = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                seen += 1
+                if seen <= skip_rows:
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        return
+
+    import pandas as pd
+    yield from pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+
+
+_recommender = None
+_schema = None
+
+def _init_worker(recommender_kwargs):
+    global _recommender, _schema
+    from .recommender import RecommenderSystem
+    _recommender = RecommenderSystem(**recommender_kwargs)
+    _schema = RequestSchema()
+
+
+def score_chunk(args):
+    """
+    Worker: scores one chunk and returns it already serialized (so the parent only
+    writes). Rows that fail validation get an 'error' result instead.
+    """
+    first_row, rows, fmt = args
+    farms, errors = _schema.parse_batch(rows)
+    scored = _recommender.get_recommendations_batch([farm for _, farm in farms])
+    results = merge_batch_results(farms, errors, scored)
+    for i, result in enumerate(results):
+        result['row'] = first_row + i
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(summary_row(result) for result in results)
+        return len(results), buffer.getvalue()
+    return len(results), ''.join(json.dumps(result, default=_json_default) + '\n' for result in results)
+
+
+class ResultWriter:
+    """Appends serialized chunks to the output file and reports the byte offset after each one."""
+    def __init__(self, path, resume_offset=None):
+        self.path = path
+        self.fmt = output_format(path)
+        if resume_offset is None:
+            self.f = open(path, 'w', newline='')
+            if self.fmt == 'csv':
+                csv.writer(self.f).writerow(CSV_OUTPUT_COLUMNS)
+        else:
+            # Drop anything written after the last checkpoint
+            self.f = open(path, 'r+', newline='')
+            self.f.seek(resume_offset)
+            self.f.truncate()
+
+    def write(self, text):
+        self.f.write(text)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+def output_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def summary_row(result):
+    if 'error' in result:
+        details = '; '.join(f"{field} {message}" for field, message in result.get('fields', {}).items())
+        return [result['row'], '', '', '', '', '', f"{result['error']}: {details}" if details else result['error']]
+    plan = result['fertilizer_plan']
+    inputs = '; '.join(f"{item['fertilizer']} {item['quantity']} {item['unit']}" for item in plan.get('inputs', []))
+    top = '; '.join(f"{c['crop']} ({c['final_score']})" for c in result['top_recommendations'])
+    return [result['row'], result['inputs']['district'], result['best_crop'], top, inputs,
+            plan.get('total_cost', ''), '']
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def load_checkpoint(path, input_path):
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('input') != os.path.abspath(input_path):
+        print(f"Ignoring checkpoint {path}: it belongs to {checkpoint.get('input')}")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def score_file(input_path, output_path, chunk_size=50_000, workers=None, resume=True, **recommender_kwargs):
+    """
+    Scores every row of input_path into output_path. Returns the number of rows
+    written in this run. recommender_kwargs go to RecommenderSystem (e.g. fertilizer_mode).
+    """
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    checkpoint = load_checkpoint(checkpoint_path, input_path) if resume and os.path.exists(output_path) else None
+    rows_done = checkpoint['rows_done'] if checkpoint else 0
+    if checkpoint:
+        print(f"Resuming {input_path} after {rows_done} rows.")
+    writer = ResultWriter(output_path, resume_offset=checkpoint['output_bytes'] if checkpoint else None)
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    written = 0
+    start = time.perf_counter()
+    pending = []
+
+    def drain(limit):
+        nonlocal rows_done, written
+        while len(pending) > limit:
+            count, text = pending.pop(0).result()
+            offset = writer.write(text)
+            rows_done += count
+            written += count
+            save_checkpoint(checkpoint_path, {'input': os.path.abspath(input_path), 'rows_done': rows_done,
+                                              'output_bytes': offset})
+            rate = written / (time.perf_counter() - start)
+            print(f"  {rows_done} rows scored ({rate:.0f} rows/s)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(recommender_kwargs,)) as pool:
+        next_row = rows_done
+        for rows in read_chunks(input_path, chunk_size, skip_rows=rows_done):
+            pending.append(pool.submit(score_chunk, (next_row, rows, writer.fmt)))
+            next_row += len(rows)
+            # Keep a bounded number of chunks in flight so memory stays flat
+            drain(max_pending - 1)
+        drain(0)
+
+    writer.close()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a large CSV / JSONL file of soil tests.")
+    parser.add_argument('input', help="CSV or JSONL with district, n, p, k and optional ph, soil_type")
+    parser.add_argument('output', help="Results file: .jsonl (full results) or .csv (one summary line per farm)")
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all CPUs)")
+    parser.add_argument('--no-resume', action='store_true', help="Start over even if a checkpoint exists")
+    parser.add_argument('--fertilizer-mode', choices=['greedy', 'least_cost'], default='greedy')
+    parser.add_argument('--fertilizer-prices', help="District,Fertilizer,Price_per_kg CSV of local prices")
+    args = parser.parse_args()
+
+    count = score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                       resume=not args.no_resume, fertilizer_mode=args.fertilizer_mode,
+                       fertilizer_prices=args.fertilizer_prices)
+    print(f"Wrote {count} results to {args.output}")
@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """In-process LRU cache with a per-entry TTL. Values are stored as given."""
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache shared by every worker process on one host, backed by a SQLite file.
+    Stands in for a networked store (Redis/Memcached) with the same get/set/clear interface.
+    """
+    def __init__(self, path='models/recommendation_cache.sqlite', ttl=3600, max_entries=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._inherited = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Short-lived connection: the app may be built in a master process that forks
+        # its workers, and SQLite connections must not cross a fork
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared across threads or processes; a forked
+        # child sees the parent's thread-local, so connections are keyed on the pid
+        pid = os.getpid()
+        entry = getattr(self._local, 'conn', None)
+        if entry is None or entry[0] != pid:
+            if entry is not None:
+                # Never close the parent's connection from the child; just stop using it
+                self._inherited.append(entry[1])
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = entry = (pid, conn)
+        return entry[1]
+
+    def get(self, key):
+        row = self._connect().execute("SELECT expires_at, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return row[1]
+
+    def set(self, key, value):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                     (key, time.time() + self.ttl, value))
+        # Occasional trim instead of on every write
+        if hash(key) % 100 == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC "
+                         "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class RecommendationCache:
+    """
+    Caches recommendation results keyed on the request inputs plus the model and
+    market-data versions, so retraining or a new price file naturally invalidates entries.
+    Results are stored as JSON, which keeps callers from mutating cached values and
+    lets the same entries be shared through SQLiteCache. Each entry also keeps the
+    model's own top crop (predicted_crop), which the response does not carry, so
+    cache hits feed the drift monitor exactly like the miss that stored them.
+    """
+    # Bumped when the stored entry layout changes, so old shared entries are not read
+    ENTRY_FORMAT = 2
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LocalCache()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def make_key(cls, model_version, market_version, district, n, p, k, ph, soil_type):
+        return (f"{cls.ENTRY_FORMAT}|{model_version}|{market_version}|{district}|"
+                f"{float(n)}|{float(p)}|{float(k)}|{float(ph)}|{soil_type}")
+
+    def get_entry(self, key):
+        """{'result': ..., 'predicted_crop': ...} or None."""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry['result']
+
+    def set(self, key, result, predicted_crop=None):
+        self.backend.set(key, json.dumps({'result': result, 'predicted_crop': predicted_crop}))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self.backend)
+        }
+
+
+def cache_from_config(spec):
+    """
+    Builds a RecommendationCache from a short spec string:
+      'local'              -> in-process LRU
+      'sqlite[:<path>]'    -> shared SQLite file
+      'off' / '' / None    -> no cache
+    """
+    if not spec or spec == 'off':
+        return None
+    if spec == 'local':
+        return RecommendationCache(LocalCache())
+    if spec.startswith('sqlite'):
+        _, _, path = spec.partition(':')
+        return RecommendationCache(SQLiteCache(path) if path else SQLiteCache())
+    raise ValueError(f"Unknown cache backend: {spec}")
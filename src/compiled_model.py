@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Files making up a compiled forest directory. Every array is a plain .npy so it
+# can be opened memory-mapped and shared between forked worker processes.
+ARRAY_FILES = ['feature', 'threshold', 'children', 'value', 'roots']
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_digest(path):
+    """Short content hash used to version model files."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def export_forest(model, out_dir, source_path=None):
+    """
+    Flattens a fitted sklearn forest classifier into contiguous node arrays:
+      feature[i], threshold[i]  split of node i
+      children[i]               global (left, right) child indices
+      value[i]                  class distribution of leaf i, pre-divided by the tree count
+      roots[t]                  index of tree t's root node
+    Leaves point back at themselves (and split on feature 0), so traversal can run a
+    fixed max_depth steps with no per-step leaf masking.
+    """
+    trees = [est.tree_ for est in model.estimators_]
+    n_classes = len(model.classes_)
+    n_trees = len(trees)
+
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        is_leaf = tree.children_left == -1
+        own = np.arange(tree.node_count) + offset
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+        threshold.append(tree.threshold.astype(np.float64))
+        children.append(np.stack([np.where(is_leaf, own, tree.children_left + offset),
+                                  np.where(is_leaf, own, tree.children_right + offset)], axis=1).astype(np.intp))
+        counts = tree.value[:, 0, :n_classes].astype(np.float64)
+        totals = counts.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1
+        value.append((counts / totals / n_trees).astype(np.float32))
+        offset += tree.node_count
+
+    arrays = {
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'children': np.concatenate(children),
+        'value': np.concatenate(value),
+        'roots': np.array(roots, dtype=np.intp),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ARRAY_FILES:
+        np.save(os.path.join(out_dir, name + '.npy'), arrays[name])
+    manifest = {
+        'classes': [str(c) for c in model.classes_],
+        'n_features': int(model.n_features_in_),
+        'n_trees': n_trees,
+        'n_nodes': int(offset),
+        'max_depth': int(max(tree.max_depth for tree in trees)),
+        'model_version': file_digest(source_path) if source_path and os.path.exists(source_path) else None,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class CompiledForest:
+    """
+    Lightweight predict_proba over an exported forest. Traversal is vectorized over
+    (rows x trees) and needs at most max_depth steps, with none of sklearn's
+    per-call validation overhead.
+    """
+    def __init__(self, model_dir, mmap=True):
+        self.model_dir = model_dir
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        mode = 'r' if mmap else None
+        for name in ARRAY_FILES:
+            array = np.load(os.path.join(model_dir, name + '.npy'), mmap_mode=mode)
+            # Plain ndarray view over the mapping: same shared pages, no np.memmap indexing overhead
+            setattr(self, name, np.asarray(array))
+        self.classes_ = np.array(self.manifest['classes'], dtype=object)
+        self.n_features_in_ = self.manifest['n_features']
+        self.max_depth = self.manifest['max_depth']
+        self.model_version = self.manifest.get('model_version')
+
+    @classmethod
+    def exists(cls, model_dir):
+        return os.path.exists(os.path.join(model_dir, MANIFEST_FILE))
+
+    def apply(self, X):
+        """Returns the leaf index reached in every tree: int array [rows, trees]."""
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) == 1:
+            # Single row: traverse all trees as one flat vector
+            row = X[0]
+            node = np.array(self.roots)
+            for _ in range(self.max_depth):
+                go_right = row[self.feature[node]] > self.threshold[node]
+                node = self.children[node, go_right.view(np.int8)]
+            return node[None, :]
+
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_right = X[rows, self.feature[node]] > self.threshold[node]
+            node = self.children[node, go_right.view(np.int8)]
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].sum(axis=1, dtype=np.float64)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,195 @@
+"""
+Input drift monitoring for live recommendation traffic.
+
+The reference sketch is built from the training data: per-feature bin edges at
+the training quantiles, the training counts in each bin and the crop label
+counts. Live traffic is counted into the same bins, so memory stays constant
+however long the server runs. Each window (DRIFT_WINDOW_SECONDS) is compared
+with the reference using the population stability index (PSI):
+    < 0.1 stable, 0.1 - 0.25 moderate shift, > 0.25 significant drift
+
+    python -m src.drift --data crop_recommendation.csv
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+REFERENCE_PATH = 'models/drift_reference.json'
+DEFAULT_BINS = 20
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+
+
+def build_reference(X, y, bins=DEFAULT_BINS, source=None):
+    """Reference sketch from training features X [rows, 7] and labels y."""
+    # Training features are float32; round them back to the decimals clients send
+    # so values sitting on a bin edge land in the same bin live as in the reference
+    X = np.round(np.asarray(X, dtype=float), 4)
+    edges, counts = [], []
+    for f in range(X.shape[1]):
+        column = X[:, f]
+        feature_edges = np.unique(np.quantile(column, np.linspace(0, 1, bins + 1)[1:-1]))
+        edges.append(feature_edges.tolist())
+        counts.append(np.bincount(np.searchsorted(feature_edges, column, side='right'),
+                                  minlength=len(feature_edges) + 1).tolist())
+    classes, class_counts = np.unique(np.asarray(y, dtype=str), return_counts=True)
+    return {
+        'features': list(FEATURES),
+        'edges': edges,
+        'counts': counts,
+        'classes': classes.tolist(),
+        'class_counts': class_counts.tolist(),
+        'rows': int(len(X)),
+        'source': source,
+    }
+
+
+def save_reference(reference, path=REFERENCE_PATH):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(reference, f)
+    os.replace(tmp, path)
+
+
+def load_reference(path=REFERENCE_PATH):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(live, reference, smoothing=0.5):
+    """Population stability index between two count vectors over the same bins."""
+    live = np.asarray(live, dtype=float) + smoothing
+    reference = np.asarray(reference, dtype=float) + smoothing
+    live /= live.sum()
+    reference /= reference.sum()
+    return float(((live - reference) * np.log(live / reference)).sum())
+
+
+class DriftMonitor:
+    """
+    Constant-memory sketches of live model inputs and predicted crops.
+    record() is a buffered row write for single requests; rows are binned in
+    vectorized flushes of `buffer_rows`. record_batch() bins a whole batch at once.
+    """
+    def __init__(self, reference, window_seconds=3600, buffer_rows=256, alert_psi=PSI_DRIFT):
+        self.reference = reference
+        self.window_seconds = window_seconds
+        self.alert_psi = alert_psi
+        self.features = reference['features']
+        self.edges = [np.asarray(e, dtype=float) for e in reference['edges']]
+        self.reference_counts = [np.asarray(c, dtype=np.int64) for c in reference['counts']]
+        self.classes = reference['classes']
+        # Last slot counts predictions of crops the training data did not have
+        self.reference_class_counts = np.append(np.asarray(reference['class_counts'], dtype=np.int64), 0)
+        self._class_ids = {crop: i for i, crop in enumerate(self.classes)}
+        self._class_maps = {}
+
+        self._buffer = np.empty((buffer_rows, len(self.features)))
+        self._buffer_classes = np.empty(buffer_rows, dtype=np.intp)
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self.total_rows = 0
+        self.last_window = None
+        self._new_window()
+
+    @classmethod
+    def from_path(cls, path=REFERENCE_PATH, **kwargs):
+        reference = load_reference(path)
+        if reference is None:
+            print(f"Drift reference not found at {path}; drift monitoring is off.")
+            return None
+        return cls(reference, **kwargs)
+
+    def _new_window(self):
+        self.window_start = time.time()
+        self._window_started = time.monotonic()
+        self.window_counts = [np.zeros(len(c), dtype=np.int64) for c in self.reference_counts]
+        self.window_class_counts = np.zeros(len(self.reference_class_counts), dtype=np.int64)
+        self.window_rows = 0
+
+    def _class_map(self, classes):
+        """Model class index -> reference class index (last slot for unknown crops), cached per model."""
+        entry = self._class_maps.get(id(classes))
+        if entry is None or entry[0] is not classes:
+            mapping = np.array([self._class_ids.get(str(c), len(self.classes)) for c in classes], dtype=np.intp)
+            entry = self._class_maps[id(classes)] = (classes, mapping)
+        return entry[1]
+
+    def record(self, features, crop):
+        """One scored request: features in FEATURES order and the model's predicted crop."""
+        class_id = self._class_ids.get(crop, len(self.classes))
+        with self._lock:
+            i = self._buffered
+            self._buffer[i] = features
+            self._buffer_classes[i] = class_id
+            self._buffered = i + 1
+            if self._buffered == len(self._buffer):
+                self._flush()
+
+    def record_batch(self, X, class_indices, classes):
+        """A scored batch: X [rows, 7] model inputs, class_indices [rows] predicted classes."""
+        mapped = self._class_map(classes)[np.asarray(class_indices)]
+        with self._lock:
+            self._add(np.asarray(X, dtype=float), mapped)
+
+    def _flush(self):
+        if self._buffered:
+            self._add(self._buffer[:self._buffered], self._buffer_classes[:self._buffered])
+            self._buffered = 0
+
+    def _add(self, X, class_ids):
+        for f, edges in enumerate(self.edges):
+            self.window_counts[f] += np.bincount(np.searchsorted(edges, X[:, f], side='right'),
+                                                 minlength=len(edges) + 1)
+        self.window_class_counts += np.bincount(class_ids, minlength=len(self.window_class_counts))
+        self.window_rows += len(X)
+        self.total_rows += len(X)
+        if time.monotonic() - self._window_started >= self.window_seconds:
+            self.last_window = self._compare()
+            drifted = self.last_window['drifted']
+            if drifted:
+                print(f"Input drift over the last window ({self.last_window['rows']} rows): {', '.join(drifted)}")
+            self._new_window()
+
+    def _compare(self):
+        features = {name: round(psi(live, ref), 4) for name, live, ref
+                    in zip(self.features, self.window_counts, self.reference_counts)}
+        classes_psi = round(psi(self.window_class_counts, self.reference_class_counts), 4)
+        drifted = [name for name, value in features.items() if value > self.alert_psi]
+        if classes_psi > self.alert_psi:
+            drifted.append('predicted_crop')
+        return {
+            'started': self.window_start,
+            'rows': int(self.window_rows),
+            'psi': features,
+            'predicted_crop_psi': classes_psi,
+            'predicted_crops': dict(zip(self.classes + ['other'], self.window_class_counts.tolist())),
+            'drifted': drifted,
+        }
+
+    def report(self):
+        """Current (partial) window and the last completed one, each compared with the reference."""
+        with self._lock:
+            self._flush()
+            current = self._compare() if self.window_rows else None
+            return {'total_rows': int(self.total_rows), 'window_seconds': self.window_seconds,
+                    'current_window': current, 'last_window': self.last_window}
+
+
+if __name__ == '__main__':
+    from .model_training import load_training_data
+
+    parser = argparse.ArgumentParser(description="Build the drift reference sketch from the training data.")
+    parser.add_argument('--data', default='crop_recommendation.csv')
+    parser.add_argument('--out', default=REFERENCE_PATH)
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS)
+    args = parser.parse_args()
+    X, y = load_training_data(args.data)
+    save_reference(build_reference(X, y, args.bins, source=args.data), args.out)
+    print(f"Drift reference ({len(X)} rows) saved to {args.out}")
@@ -1,5 +1,41 @@
+import csv
+import os
+from functools import lru_cache
+from itertools import combinations
+import numpy as np
+
+# Used when neither the crop/soil pair nor the crop has a row in the table
+DEFAULT_TARGET = (120, 60, 60)
+ANY_SOIL = 'Any'
+
+# Nutrient fractions of the greedy plan's products
+DAP_P = 0.46
+DAP_N = 0.18
+UREA_N = 0.46
+MOP_K = 0.60
+
+# Approximate farm-gate prices (INR per kg, subsidised bag rates). These are the
+# default everywhere; a price file only overrides them for the districts it lists.
+# Urea 266.50/45kg, DAP 1350/50kg, MOP 1700/50kg, etc.
+DEFAULT_FERTILIZER_PRICES = {
+    'Urea': 5.92,
+    'DAP': 27.0,
+    'MOP': 34.0,
+    'SSP': 10.0,
+    'NPK 14-35-14': 30.0
+}
+DISPLAY_NAMES = {'MOP': 'MOP (Muriate of Potash)'}
+NUTRIENT_NAMES = {'N': 'Nitrogen', 'P': 'Phosphorus', 'K': 'Potassium'}
+
 class FertilizerEngine:
-    def __init__(self):
+    def __init__(self, data_path='fertilizer_data.csv', mode='greedy', price_path=None):
+        """
+        mode: 'greedy'     -> fixed DAP -> Urea -> MOP sequence
+              'least_cost' -> cheapest mix of all products in self.fertilizers that covers the deficit
+        price_path: optional CSV (District,Fertilizer,Price_per_kg) of local prices; without one
+                    every district uses DEFAULT_FERTILIZER_PRICES
+        """
+        self.mode = mode
         # NPK content in common fertilizers
         self.fertilizers = {
             'Urea': {'N': 0.46, 'P': 0, 'K': 0},
@@ -8,68 +44,298 @@ class FertilizerEngine:
             'SSP': {'N': 0, 'P': 0.16, 'K': 0},
             'NPK 14-35-14': {'N': 0.14, 'P': 0.35, 'K': 0.14} # Example complex
         }
+        self.load_targets(data_path)
+        self.load_prices(price_path)
+        self._build_bases()
+        self._solve_cached = lru_cache(maxsize=8192)(self._solve)
+
+    def load_targets(self, data_path):
+        """
+        Loads the crop x soil NPK target table ('Target' values for a healthy yield)
+        from fertilizer_data.csv into an indexed structure:
+          self.targets          float array [rows, 3] of N, P, K
+          self._target_index    (crop, soil_type) -> row; soil 'Any' is the crop-wide row
+        The last row holds DEFAULT_TARGET.
+        """
+        index = {}
+        rows = []
+        if os.path.exists(data_path):
+            with open(data_path, newline='') as f:
+                for record in csv.DictReader(f):
+                    key = (record['Crop'], record['Soil_Type'] or ANY_SOIL)
+                    # The table may list several fertilizers per crop/soil; targets are shared
+                    if key not in index:
+                        index[key] = len(rows)
+                        rows.append((float(record['N_needed']), float(record['P_needed']), float(record['K_needed'])))
+        rows.append(DEFAULT_TARGET)
+        self.targets = np.array(rows, dtype=float)
+        self._target_index = index
+        self._default_row = len(rows) - 1
+
+    def target_row(self, crop, soil_type=None):
+        index = self._target_index
+        row = index.get((crop, soil_type)) if soil_type else None
+        if row is None:
+            row = index.get((crop, ANY_SOIL), self._default_row)
+        return row
+
+    def get_target(self, crop, soil_type=None):
+        n, p, k = self.targets[self.target_row(crop, soil_type)].tolist()
+        return {'N': n, 'P': p, 'K': k}
+
+    def load_prices(self, price_path):
+        self.products = list(self.fertilizers)
+        self.district_prices = {}
+        if not price_path:
+            return
+        if not os.path.exists(price_path):
+            print(f"Fertilizer prices not found at {price_path}; using the default subsidised rates.")
+            return
+        with open(price_path, newline='') as f:
+            for record in csv.DictReader(f):
+                self.district_prices.setdefault(record['District'], {})[record['Fertilizer']] = float(record['Price_per_kg'])
+
+    def prices_for(self, district=None, prices=None):
+        """Price vector (INR/kg, in self.products order): explicit prices > district prices > defaults."""
+        merged = dict(DEFAULT_FERTILIZER_PRICES)
+        merged.update(self.district_prices.get(district, {}))
+        if prices:
+            merged.update(prices)
+        return tuple(float(merged[name]) for name in self.products)
+
+    def _build_bases(self):
+        """
+        Precomputes every basis of the least-cost LP
+            min c.x  s.t.  A x >= deficit, x >= 0
+        (A = nutrient fractions of the products). With surplus variables s the
+        constraints are [A, -I] [x; s] = deficit, and an optimum sits on a basis of
+        3 columns, so x_B = inv(B) @ deficit for each of these stored inverses.
+        """
+        composition = np.array([[self.fertilizers[name][nutrient] for name in self.products]
+                                for nutrient in ('N', 'P', 'K')], dtype=float)
+        columns = np.hstack([composition, -np.eye(3)])
+        bases, inverses = [], []
+        for basis in combinations(range(columns.shape[1]), 3):
+            B = columns[:, basis]
+            if abs(np.linalg.det(B)) > 1e-9:
+                bases.append(basis)
+                inverses.append(np.linalg.inv(B))
+        self._bases = np.array(bases)
+        self._basis_inverses = np.array(inverses)
+        self._n_columns = columns.shape[1]
 
-    def recommend(self, crop, soil_npk):
+    def _solve_bases(self, deficits, price_rows):
+        """
+        Vectorized exact solve for many deficits at once.
+        deficits: [rows, 3]; price_rows: [rows, products]
+        Returns product quantities [rows, products] and their cost [rows].
+        """
+        # x_B for every (row, basis): [rows, bases, 3]
+        x_basis = np.einsum('bij,rj->rbi', self._basis_inverses, deficits)
+        feasible = (x_basis >= -1e-9).all(axis=2)
+        # Surplus columns cost nothing
+        costs = np.concatenate([price_rows, np.zeros((len(price_rows), self._n_columns - price_rows.shape[1]))], axis=1)
+        basis_cost = (np.take_along_axis(costs[:, None, :], self._bases[None, :, :].repeat(len(costs), 0), axis=2)
+                      * x_basis).sum(axis=2)
+        basis_cost[~feasible] = np.inf
+        best = np.argmin(basis_cost, axis=1)
+
+        full = np.zeros((len(deficits), self._n_columns))
+        rows = np.arange(len(deficits))[:, None]
+        full[rows, self._bases[best]] = np.maximum(x_basis[np.arange(len(deficits)), best], 0)
+        quantities = full[:, :len(self.products)]
+        return quantities, (quantities * price_rows).sum(axis=1)
+
+    def input_costs(self, targets, soil_npk, price_rows, mode=None, chunk_rows=8192):
+        """
+        Fertilizer cost (INR/acre) of bringing the soil up to each target, e.g. for
+        every candidate crop at once.
+        targets:    [..., 3] N, P, K targets
+        soil_npk:   soil N, P, K, broadcastable against targets
+        price_rows: [..., products] prices in self.products order, broadcastable against targets
+        Returns costs shaped like targets[..., 0]. 'greedy' prices the DAP -> Urea -> MOP plan.
+        """
+        deficit = np.maximum(np.asarray(targets, dtype=float) - soil_npk, 0)
+        prices = np.asarray(price_rows, dtype=float)
+
+        if (mode or self.mode) == 'least_cost':
+            shape = deficit.shape[:-1]
+            deficit = deficit.reshape(-1, 3)
+            prices = np.broadcast_to(prices, shape + (len(self.products),)).reshape(-1, len(self.products))
+            # The basis solve is [rows, bases, 3]; keep it bounded for big batches
+            cost = np.empty(len(deficit))
+            for start in range(0, len(deficit), chunk_rows):
+                part = slice(start, start + chunk_rows)
+                cost[part] = self._solve_bases(np.ceil(deficit[part]), prices[part])[1]
+            return cost.reshape(shape)
+
+        dap = deficit[..., 1] / DAP_P
+        urea = np.maximum(deficit[..., 0] - dap * DAP_N, 0) / UREA_N
+        mop = deficit[..., 2] / MOP_K
+        i_dap, i_urea, i_mop = (self.products.index(name) for name in ('DAP', 'Urea', 'MOP'))
+        return dap * prices[..., i_dap] + urea * prices[..., i_urea] + mop * prices[..., i_mop]
+
+    def _solve(self, deficit, prices):
+        quantities, cost = self._solve_bases(np.array([deficit], dtype=float), np.array([prices]))
+        return tuple(quantities[0].tolist()), float(cost[0])
+
+    def optimize(self, deficit, district=None, prices=None):
+        """
+        Least-cost product mix covering an N/P/K deficit (kg/acre).
+        Deficits are rounded up to whole kg so solutions can be memoized.
+        Returns ({product: kg}, total cost in INR).
+        """
+        rounded = tuple(float(np.ceil(max(0.0, d))) for d in deficit)
+        quantities, cost = self._solve_cached(rounded, self.prices_for(district, prices))
+        return dict(zip(self.products, quantities)), cost
+
+    def recommend(self, crop, soil_npk, soil_type=None, district=None, prices=None, mode=None):
         """
         soil_npk: {'N': val, 'P': val, 'K': val}
         Returns: List of fertilizer actions
         """
-        # Standard requirements (Simplified lookup - real system has a DB)
-        # These are 'Target' values for a healthy yield
-        # In a real app, this comes from the 'fertilizer_data.csv' or database based on crop & soil test
-        
-        # Default targets if not found
-        target = {'N': 120, 'P': 60, 'K': 60} 
-        
-        # Adjust targets based on crop (very simple rules)
-        if crop in ['Rice', 'Maize', 'Sugarcane']:
-            target = {'N': 120, 'P': 60, 'K': 60}
-        elif crop in ['Pulses', 'Chickpea', 'Lentil']:
-            target = {'N': 20, 'P': 40, 'K': 20} # Legumes need less N
-        elif crop in ['Cotton']:
-            target = {'N': 90, 'P': 45, 'K': 45}
-            
+        target = self.get_target(crop, soil_type)
+
+        if (mode or self.mode) == 'least_cost':
+            deficit = (target['N'] - soil_npk['N'], target['P'] - soil_npk['P'], target['K'] - soil_npk['K'])
+            quantities, cost = self.optimize(deficit, district, prices)
+            return {
+                'inputs': self._mix_inputs(quantities, self.prices_for(district, prices)),
+                'schedule': self.get_schedule(crop),
+                'total_cost': round(cost, 2)
+            }
+
         deficit_n = max(0, target['N'] - soil_npk['N'])
         deficit_p = max(0, target['P'] - soil_npk['P'])
         deficit_k = max(0, target['K'] - soil_npk['K'])
-        
-        recommendations = []
-        
+
         # Calculate Fertilizer Quantities
         # 1. Phosphorus (P) usually comes from DAP or SSP. Let's prioritize DAP.
-        dap_qty = 0
-        if deficit_p > 0:
-            dap_qty = deficit_p / 0.46 # DAP is 46% P roughly
+        dap_qty = deficit_p / DAP_P # DAP is 46% P roughly
+        # DAP also adds N
+        deficit_n = max(0, deficit_n - dap_qty * DAP_N)
+        # 2. Nitrogen (N) from Urea
+        urea_qty = deficit_n / UREA_N
+        # 3. Potassium (K) from MOP
+        mop_qty = deficit_k / MOP_K
+
+        return {
+            'inputs': self._greedy_inputs(dap_qty, urea_qty, mop_qty),
+            'schedule': self.get_schedule(crop)
+        }
+
+    def recommend_batch(self, crops, soil_npk, soil_types=None, districts=None, mode=None):
+        """
+        Vectorized plan for many soil tests.
+        crops:      sequence of crop names
+        soil_npk:   array-like [rows, 3] of soil N, P, K
+        soil_types: optional sequence of soil types
+        districts:  optional sequence of districts (local prices for 'least_cost')
+        Returns: {'mode', 'target': [rows, 3], 'products': names, 'quantities': [rows, products],
+                  <product name>: [rows] (kg/acre), and 'cost': [rows] for 'least_cost'}
+        """
+        mode = mode or self.mode
+        soil_npk = np.asarray(soil_npk, dtype=float).reshape(-1, 3)
+        if soil_types is None:
+            soil_types = [None] * len(crops)
+        # Resolve each distinct (crop, soil) pair once, then gather
+        pair_rows = {}
+        rows = np.empty(len(crops), dtype=np.intp)
+        for i, key in enumerate(zip(crops, soil_types)):
+            row = pair_rows.get(key)
+            if row is None:
+                row = pair_rows[key] = self.target_row(*key)
+            rows[i] = row
+        target = self.targets[rows]
+        deficit = np.maximum(target - soil_npk, 0)
+
+        if mode == 'least_cost':
+            if districts is None:
+                districts = [None] * len(crops)
+            district_prices = {}
+            price_rows = np.empty((len(crops), len(self.products)))
+            for i, district in enumerate(districts):
+                prices = district_prices.get(district)
+                if prices is None:
+                    prices = district_prices[district] = self.prices_for(district)
+                price_rows[i] = prices
+            quantities, cost = self._solve_bases(np.ceil(deficit), price_rows)
+            batch = {'mode': mode, 'target': target, 'products': list(self.products),
+                     'quantities': quantities, 'cost': cost, 'price_rows': price_rows}
+        else:
+            dap = deficit[:, 1] / DAP_P
+            urea = np.maximum(deficit[:, 0] - dap * DAP_N, 0) / UREA_N
+            mop = deficit[:, 2] / MOP_K
+            batch = {'mode': 'greedy', 'target': target, 'products': ['DAP', 'Urea', 'MOP'],
+                     'quantities': np.stack([dap, urea, mop], axis=1)}
+        for j, name in enumerate(batch['products']):
+            batch[name] = batch['quantities'][:, j]
+        return batch
+
+    def plans_from_batch(self, crops, batch):
+        """Expands recommend_batch output into recommend()-shaped plans."""
+        schedules = {}
+        plans = []
+        quantities = batch['quantities'].tolist()
+        for i, crop in enumerate(crops):
+            if crop not in schedules:
+                schedules[crop] = self.get_schedule(crop)
+            if batch['mode'] == 'least_cost':
+                mix = dict(zip(batch['products'], quantities[i]))
+                plans.append({'inputs': self._mix_inputs(mix, batch['price_rows'][i]),
+                              'schedule': schedules[crop],
+                              'total_cost': round(float(batch['cost'][i]), 2)})
+            else:
+                plans.append({'inputs': self._greedy_inputs(*quantities[i]), 'schedule': schedules[crop]})
+        return plans
+
+    def _mix_inputs(self, quantities, prices):
+        recommendations = []
+        for name, price in zip(self.products, prices):
+            qty = quantities[name]
+            if qty < 0.005:
+                continue
+            supplies = [NUTRIENT_NAMES[n] for n in ('N', 'P', 'K') if self.fertilizers[name][n] > 0]
+            recommendations.append({
+                'fertilizer': DISPLAY_NAMES.get(name, name),
+                'quantity': round(qty, 2),
+                'unit': 'kg/acre',
+                'reason': 'To supply ' + ' and '.join(supplies),
+                'cost': round(qty * price, 2)
+            })
+        if not recommendations:
+            recommendations.append({
+                'fertilizer': 'General Organic Manure',
+                'quantity': 1000,
+                'unit': 'kg/acre',
+                'reason': 'Soil is rich in NPK, maintenance dose only.'
+            })
+        return recommendations
+
+    def _greedy_inputs(self, dap_qty, urea_qty, mop_qty):
+        recommendations = []
+        if dap_qty > 0:
             recommendations.append({
                 'fertilizer': 'DAP',
                 'quantity': round(dap_qty, 2),
                 'unit': 'kg/acre',
                 'reason': 'To supply Phosphorus'
             })
-            # DAP also adds N
-            supplied_n = dap_qty * 0.18
-            deficit_n = max(0, deficit_n - supplied_n)
-            
-        # 2. Nitrogen (N) from Urea
-        if deficit_n > 0:
-            urea_qty = deficit_n / 0.46
+        if urea_qty > 0:
             recommendations.append({
                 'fertilizer': 'Urea',
                 'quantity': round(urea_qty, 2),
                 'unit': 'kg/acre',
                 'reason': 'To supply Nitrogen'
             })
-            
-        # 3. Potassium (K) from MOP
-        if deficit_k > 0:
-            mop_qty = deficit_k / 0.60
+        if mop_qty > 0:
             recommendations.append({
                 'fertilizer': 'MOP (Muriate of Potash)',
                 'quantity': round(mop_qty, 2),
                 'unit': 'kg/acre',
                 'reason': 'To supply Potassium'
             })
-            
+
         if not recommendations:
             recommendations.append({
                 'fertilizer': 'General Organic Manure',
@@ -77,15 +343,8 @@ class FertilizerEngine:
                 'unit': 'kg/acre',
                 'reason': 'Soil is rich in NPK, maintenance dose only.'
             })
+        return recommendations
 
-        # Schedule
-        schedule = self.get_schedule(crop)
-        
-        return {
-            'inputs': recommendations,
-            'schedule': schedule
-        }
-        
     def get_schedule(self, crop):
         if crop == 'Rice':
             return [
@@ -0,0 +1,195 @@
+"""
+Precomputed top-k crops over a (district, N, P, K, pH) grid.
+
+With mock weather every district's weather is a constant, so a request whose
+soil values sit exactly on the grid always produces the same model output. The
+offline job below scores the whole grid once; RecommenderSystem then answers
+exact grid hits with a table read and runs the model for everything else.
+
+    python -m src.lookup_table --n 0:240:20 --p 0:120:10 --k 0:240:20 --ph 4.5:8.5:0.5
+"""
+import argparse
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+TABLE_FILES = ['top_classes', 'top_probs']
+MANIFEST_FILE = 'manifest.json'
+# How equal probabilities are ordered (see ranking.top_k_indices); tables built
+# with another ordering are stale
+TIE_BREAK = 'lowest_class_index'
+
+# Default grid: typical soil-lab reporting steps
+DEFAULT_GRID = {
+    'n': (0, 240, 20),
+    'p': (0, 120, 10),
+    'k': (0, 240, 20),
+    'ph': (4.5, 8.5, 0.5),
+}
+GRID_AXES = ['n', 'p', 'k', 'ph']
+
+
+def grid_axis(start, stop, step):
+    """Inclusive range of grid values, rounded so they compare equal to what clients send."""
+    count = int(round((stop - start) / step)) + 1
+    return [round(start + i * step, 6) for i in range(count)]
+
+
+class LookupTable:
+    """
+    Memory-mapped table:
+      top_classes[row]  uint8 class indices of the top-k crops, best first
+      top_probs[row]    float64 probabilities of those crops (kept at full precision
+                        so table answers match live inference exactly)
+    Rows are laid out district-major, then N, P, K, pH (C order over the axes).
+    """
+    def __init__(self, table_dir, mmap=True):
+        self.table_dir = table_dir
+        with open(os.path.join(table_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        mode = 'r' if mmap else None
+        for name in TABLE_FILES:
+            setattr(self, name, np.asarray(np.load(os.path.join(table_dir, name + '.npy'), mmap_mode=mode)))
+        self.classes = self.manifest['classes']
+        self.model_version = self.manifest['model_version']
+        self.weather_version = self.manifest['weather_version']
+        self.tie_break = self.manifest.get('tie_break')
+        self._districts = {d: i for i, d in enumerate(self.manifest['districts'])}
+        self._axes = [{value: i for i, value in enumerate(self.manifest['axes'][name])} for name in GRID_AXES]
+        sizes = [len(self.manifest['axes'][name]) for name in GRID_AXES]
+        # Row strides for district, n, p, k, ph
+        self._strides = [int(np.prod(sizes))] + [int(np.prod(sizes[i + 1:])) for i in range(len(sizes))]
+
+    @classmethod
+    def exists(cls, table_dir):
+        return os.path.exists(os.path.join(table_dir, MANIFEST_FILE))
+
+    def row_index(self, district, n, p, k, ph):
+        """Row of an exact grid hit, or None."""
+        district_id = self._districts.get(district)
+        if district_id is None:
+            return None
+        row = district_id * self._strides[0]
+        for axis, stride, value in zip(self._axes, self._strides[1:], (n, p, k, ph)):
+            try:
+                i = axis.get(float(value))
+            except (TypeError, ValueError):
+                return None
+            if i is None:
+                return None
+            row += i * stride
+        return row
+
+    def lookup(self, district, n, p, k, ph):
+        """Returns [(crop, probability), ...] best first for a grid hit, else None."""
+        row = self.row_index(district, n, p, k, ph)
+        if row is None:
+            return None
+        return [(self.classes[c], float(prob)) for c, prob in zip(self.top_classes[row].tolist(), self.top_probs[row])]
+
+
+def _score_district(args):
+    """Worker: scores every grid point of one district. Returns (top_classes, top_probs)."""
+    district, axes, top_k, recommender_kwargs = args
+    from .ranking import top_k_indices
+    from .recommender import DEFAULT_WEATHER
+    recommender = _worker_recommender(recommender_kwargs)
+    weather = recommender.weather_service.get_weather(district) or DEFAULT_WEATHER
+
+    mesh = np.meshgrid(*(np.asarray(axes[name], dtype=float) for name in GRID_AXES), indexing='ij')
+    n, p, k, ph = (m.ravel() for m in mesh)
+    X = np.column_stack([n, p, k, np.full_like(n, weather['temperature']), np.full_like(n, weather['humidity']),
+                         ph, np.full_like(n, weather['rainfall'])])
+
+    top_classes = np.empty((len(X), top_k), dtype=np.uint8)
+    top_probs = np.empty((len(X), top_k), dtype=np.float64)
+    for start in range(0, len(X), 50_000):
+        probs = recommender.model.predict_proba(recommender._model_input(X[start:start + 50_000]))
+        # Same ordering (and tie-break) as RecommenderSystem
+        top = top_k_indices(probs, top_k)
+        top_classes[start:start + len(top)] = top
+        top_probs[start:start + len(top)] = np.take_along_axis(probs, top, axis=1)
+    return top_classes, top_probs
+
+
+_recommender = None
+
+def _worker_recommender(kwargs):
+    global _recommender
+    if _recommender is None:
+        from .recommender import RecommenderSystem
+        _recommender = RecommenderSystem(lookup_path=None, **kwargs)
+    return _recommender
+
+
+def build_lookup_table(out_dir='models/lookup_table', grid=None, districts=None, n_jobs=1, **recommender_kwargs):
+    """
+    Scores the (district, N, P, K, pH) grid with the current model and mock
+    weather, and writes the table to out_dir. Returns the manifest.
+    grid: {'n'|'p'|'k'|'ph': (start, stop, step)}, missing axes use DEFAULT_GRID
+    """
+    from .recommender import TOP_K
+    recommender = _worker_recommender(recommender_kwargs)
+    if not recommender.model:
+        raise RuntimeError("No model to build the lookup table from. Please train first.")
+    weather_version = recommender.weather_service.static_version()
+    if weather_version is None:
+        raise RuntimeError("Weather changes over time; a lookup table needs static (mock) weather.")
+
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    axes = {name: grid_axis(*grid[name]) for name in GRID_AXES}
+    districts = list(districts or recommender.weather_service.districts)
+    classes = [str(c) for c in recommender.model.classes_]
+    top_k = min(TOP_K, len(classes))
+
+    jobs = [(district, axes, top_k, recommender_kwargs) for district in districts]
+    if n_jobs == 1:
+        parts = [_score_district(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            parts = list(pool.map(_score_district, jobs))
+
+    tmp_dir = out_dir.rstrip('/') + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, 'top_classes.npy'), np.concatenate([part[0] for part in parts]))
+    np.save(os.path.join(tmp_dir, 'top_probs.npy'), np.concatenate([part[1] for part in parts]))
+    manifest = {
+        'model_version': recommender.model_version,
+        'weather_version': weather_version,
+        'classes': classes,
+        'districts': districts,
+        'axes': axes,
+        'top_k': top_k,
+        'tie_break': TIE_BREAK,
+        'rows': len(districts) * int(np.prod([len(axes[name]) for name in GRID_AXES])),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    # Swap the finished table in as a whole
+    if os.path.exists(out_dir):
+        import shutil
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def _parse_range(text):
+    start, stop, step = (float(v) for v in text.split(':'))
+    return start, stop, step
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute top-k crops over a district x soil grid.")
+    parser.add_argument('--out', default='models/lookup_table')
+    for name in GRID_AXES:
+        start, stop, step = DEFAULT_GRID[name]
+        parser.add_argument(f'--{name}', type=_parse_range, default=DEFAULT_GRID[name],
+                            help=f"start:stop:step (default {start}:{stop}:{step})")
+    parser.add_argument('--districts', nargs='+', help="Defaults to every district with weather normals")
+    parser.add_argument('--n-jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    manifest = build_lookup_table(args.out, grid={name: getattr(args, name) for name in GRID_AXES},
+                                  districts=args.districts, n_jobs=args.n_jobs)
+    print(f"Wrote {manifest['rows']} rows for {len(manifest['districts'])} districts to {args.out}")
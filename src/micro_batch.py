@@ -0,0 +1,60 @@
+import asyncio
+
+from . import metrics
+
+BATCH_SIZE = metrics.REGISTRY.histogram(
+    'crop_microbatch_size', 'Requests scored together by the micro-batcher.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+class MicroBatcher:
+    """
+    Collects single requests that arrive within max_wait seconds of each other
+    and scores them with one score_batch(items) call on the executor, so
+    concurrent /api/recommend calls share one predict_proba.
+
+    score_batch: list of items -> list of results in the same order
+    A batch is flushed when it reaches max_batch items or max_wait after its
+    first item arrived. Must be used from a single event loop.
+    """
+    def __init__(self, score_batch, executor, max_batch=64, max_wait=0.002):
+        self.score_batch = score_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        BATCH_SIZE.observe(len(items))
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, self.score_batch, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (client disconnect cancels its task)
+            if not future.done():
+                future.set_result(result)
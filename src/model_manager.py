@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from .metrics import REGISTRY
+from .model_registry import ModelRegistry, MODEL_FILE, COMPILED_DIR
+
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    'crop_model_call_seconds', 'Scoring time per call (single request or batch) by model version and role.',
+    ['version', 'role'])
+MODEL_PREDICTIONS = REGISTRY.counter(
+    'crop_model_predictions', 'Best-crop predictions by model version and role.', ['version', 'role', 'crop'])
+MODEL_RELOADS = REGISTRY.counter(
+    'crop_model_reloads', 'Background model loads by outcome (swapped, rejected, failed).', ['result'])
+
+# Soil tests every new version has to score sensibly before it takes traffic
+PROBE_FARMS = [
+    {'district': 'Coimbatore', 'n': 90, 'p': 45, 'k': 40, 'ph': 6.5, 'soil_type': 'Loamy'},
+    {'district': 'Thanjavur', 'n': 80, 'p': 40, 'k': 40, 'ph': 6.0, 'soil_type': 'Clayey'},
+    {'district': 'Madurai', 'n': 20, 'p': 10, 'k': 30, 'ph': 7.5, 'soil_type': 'Red'},
+    {'district': 'Nilgiris', 'n': 120, 'p': 60, 'k': 200, 'ph': 5.0, 'soil_type': 'Black'},
+]
+
+
+class ModelManager:
+    """
+    Serves recommendations from the registry's promoted model and swaps in new
+    versions without a restart.
+
+    A watcher thread polls the registry every `interval` seconds. When LATEST (or
+    the A/B CANDIDATE) points at a version that is not being served, it is loaded
+    next to the current one, validated on PROBE_FARMS, warmed up and swapped in
+    with a single assignment; in-flight requests finish on the model they started
+    with. A candidate gets `fraction` of the traffic, chosen by a hash of the farm
+    so the same soil test always sees the same version.
+
+    Exposes the RecommenderSystem interface the app uses (get_recommendation,
+    get_recommendations_batch, warm_up, cache, model, ...) for the active model.
+    """
+    def __init__(self, recommender, registry_dir='models/registry', interval=10.0, min_accuracy=0.0):
+        self.registry = ModelRegistry(registry_dir) if registry_dir else None
+        self.interval = interval
+        self.min_accuracy = min_accuracy
+        self.rejected = set()
+        # (active, active registry version, candidate, candidate version, fraction), replaced as a whole
+        self._serving = (recommender, self._registry_version_of(recommender), None, None, 0.0)
+        self._watcher_pid = None
+        self._watcher_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _registry_version_of(self, recommender):
+        """Registry version whose model the recommender was loaded from, if the registry has it promoted."""
+        latest = self.registry.latest() if self.registry else None
+        if latest is None:
+            return None
+        try:
+            digest = self.registry.metadata(latest).get('model_digest')
+        except OSError:
+            return None
+        return latest if digest == recommender.model_version else None
+
+    # --- serving ---
+
+    @property
+    def active(self):
+        return self._serving[0]
+
+    @property
+    def candidate(self):
+        return self._serving[2]
+
+    def serving(self):
+        """Summary of what is served, e.g. for /api/models."""
+        active, active_version, candidate, candidate_version, fraction = self._serving
+        return {
+            'active': {'version': active_version, 'model_version': active.model_version},
+            'candidate': None if candidate is None else {
+                'version': candidate_version, 'model_version': candidate.model_version, 'fraction': fraction},
+            'rejected': sorted(self.rejected),
+        }
+
+    def _route(self, district, n, p, k, ph, soil_type):
+        active, _, candidate, _, fraction = self._serving
+        if candidate is None or fraction <= 0:
+            return active, 'active'
+        # Numbers as floats (like RecommendationCache.make_key): JSON sends 90, forms and CSVs 90.0
+        key = f"{district}|{float(n)}|{float(p)}|{float(k)}|{float(ph)}|{soil_type}".encode('utf-8')
+        if zlib.crc32(key) / 2 ** 32 < fraction:
+            return candidate, 'candidate'
+        return active, 'active'
+
+    def get_recommendation(self, district, n, p, k, ph=6.5, soil_type="Loamy"):
+        self._ensure_watcher()
+        recommender, role = self._route(district, n, p, k, ph, soil_type)
+        start = time.perf_counter()
+        result = recommender.get_recommendation(district, n, p, k, ph, soil_type)
+        self._record(recommender, role, [result], time.perf_counter() - start)
+        return result
+
+    def get_recommendations_batch(self, farms, use_cache=False):
+        self._ensure_watcher()
+        groups = {}
+        for i, farm in enumerate(farms):
+            recommender, role = self._route(farm['district'], farm['n'], farm['p'], farm['k'],
+                                            farm.get('ph', 6.5), farm.get('soil_type', 'Loamy'))
+            groups.setdefault((id(recommender), role), (recommender, role, []))[2].append(i)
+        if len(groups) <= 1:
+            recommender, role = next(iter(groups.values()))[:2] if groups else (self.active, 'active')
+            start = time.perf_counter()
+            results = recommender.get_recommendations_batch(farms, use_cache=use_cache)
+            self._record(recommender, role, results, time.perf_counter() - start)
+            return results
+
+        results = [None] * len(farms)
+        for recommender, role, rows in groups.values():
+            start = time.perf_counter()
+            scored = recommender.get_recommendations_batch([farms[i] for i in rows], use_cache=use_cache)
+            self._record(recommender, role, scored, time.perf_counter() - start)
+            for i, result in zip(rows, scored):
+                results[i] = result
+        return results
+
+    def _record(self, recommender, role, results, elapsed):
+        version = str(recommender.model_version)
+        MODEL_CALL_SECONDS.observe(elapsed, version, role)
+        for crop, count in Counter(result.get('best_crop') for result in results).items():
+            if crop is not None:
+                MODEL_PREDICTIONS.inc(version, role, crop, amount=count)
+
+    def warm_up(self):
+        self.active.warm_up()
+
+    # The rest of the RecommenderSystem interface reads from the active model
+    @property
+    def model(self):
+        return self.active.model
+
+    @property
+    def model_version(self):
+        return self.active.model_version
+
+    @property
+    def cache(self):
+        return self.active.cache
+
+    @property
+    def weather_service(self):
+        return self.active.weather_service
+
+    @property
+    def market_service(self):
+        return self.active.market_service
+
+    @property
+    def fertilizer_engine(self):
+        return self.active.fertilizer_engine
+
+    # --- reloading ---
+
+    def _ensure_watcher(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self.registry is None or self.interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Model watcher error: {e}")
+            time.sleep(self.interval)
+
+    def check(self):
+        """
+        Brings the served models in line with the registry's LATEST and CANDIDATE.
+        Loading happens on the calling thread; returns True when serving changed.
+        """
+        with self._reload_lock:
+            active, active_version, candidate, candidate_version, fraction = self._serving
+            latest = self.registry.latest()
+            wanted_candidate, wanted_fraction = self.registry.candidate()
+            # Versions already in memory are reused when active and candidate trade places
+            loaded = {version: recommender for version, recommender in
+                      ((active_version, active), (candidate_version, candidate)) if version is not None}
+
+            if latest and latest != active_version and latest not in self.rejected:
+                recommender = loaded.get(latest) or self._load(latest)
+                if recommender is not None:
+                    active, active_version = recommender, latest
+                    print(f"Now serving model version {latest}")
+
+            if wanted_candidate in (None, active_version) or wanted_candidate in self.rejected:
+                candidate, candidate_version, fraction = None, None, 0.0
+            else:
+                if wanted_candidate != candidate_version:
+                    candidate = loaded.get(wanted_candidate) or self._load(wanted_candidate)
+                    candidate_version = wanted_candidate if candidate is not None else None
+                    if candidate is not None:
+                        print(f"Routing {wanted_fraction:.0%} of traffic to candidate {wanted_candidate}")
+                fraction = wanted_fraction if candidate is not None else 0.0
+
+            serving = (active, active_version, candidate, candidate_version, fraction)
+            if serving == self._serving:
+                return False
+            self._serving = serving
+            return True
+
+    def _load(self, version):
+        """Loads, validates and warms up a registry version; None (and remembered) if it fails."""
+        try:
+            path = self.registry.path(version)
+            recommender = self.active.with_model(os.path.join(path, MODEL_FILE), os.path.join(path, COMPILED_DIR))
+            # Probe requests stay out of the drift sketches; the monitor is attached once validated
+            monitor, recommender.drift_monitor = recommender.drift_monitor, None
+            problem = self.validate(recommender, self.registry.metadata(version))
+        except Exception as e:
+            problem = f"failed to load ({e})"
+            MODEL_RELOADS.inc('failed')
+        else:
+            if problem:
+                MODEL_RELOADS.inc('rejected')
+        if problem:
+            print(f"Not serving model version {version}: {problem}")
+            self.rejected.add(version)
+            return None
+        recommender.warm_up()
+        recommender.drift_monitor = monitor
+        MODEL_RELOADS.inc('swapped')
+        return recommender
+
+    def validate(self, recommender, metadata):
+        """Returns a reason to reject the loaded model, or None if it can serve."""
+        if not recommender.model:
+            return "model did not load"
+        # Both are held-out scores; incremental updates report the new rows separately
+        for key in ('accuracy', 'accuracy_new_rows'):
+            accuracy = metadata.get(key)
+            if accuracy is not None and accuracy < self.min_accuracy:
+                return f"{key} {accuracy:.4f} is below {self.min_accuracy:.4f}"
+        classes = [str(c) for c in recommender.model.classes_]
+        X = np.array([[farm['n'], farm['p'], farm['k'], 30, 80, farm['ph'], 200] for farm in PROBE_FARMS], dtype=float)
+        probs = np.asarray(recommender.model.predict_proba(recommender._model_input(X)))
+        if probs.shape != (len(PROBE_FARMS), len(classes)) or not np.isfinite(probs).all():
+            return f"predict_proba returned shape {probs.shape} or non-finite values"
+        if not np.allclose(probs.sum(axis=1), 1.0, atol=1e-3):
+            return "probabilities do not sum to 1"
+        for result in recommender.get_recommendations_batch(PROBE_FARMS):
+            if result.get('best_crop') not in classes:
+                return f"probe recommendation failed: {result.get('error', result.get('best_crop'))}"
+        return None
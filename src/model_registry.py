@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import time
+import joblib
+import numpy as np
+
+from .compiled_model import export_forest, file_digest
+
+MODEL_FILE = 'model.pkl'
+COMPILED_DIR = 'compiled'
+METADATA_FILE = 'metadata.json'
+LATEST_FILE = 'LATEST'
+CANDIDATE_FILE = 'CANDIDATE'
+
+
+class LabelEncodedClassifier:
+    """
+    Wraps estimators that need integer labels (e.g. XGBoost) so they expose
+    crop names in classes_ like the sklearn models do.
+    """
+    def __init__(self, estimator, classes):
+        self.estimator = estimator
+        self.classes_ = np.asarray(classes, dtype=object)
+
+    def fit(self, X, y, **fit_params):
+        codes = np.searchsorted(self.classes_.astype(str), np.asarray(y, dtype=str))
+        self.estimator.fit(X, codes, **fit_params)
+        return self
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(np.asarray(X, dtype=np.float32))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class ModelRegistry:
+    """
+    Versioned model store:
+      <root>/<version>/model.pkl        the fitted estimator
+      <root>/<version>/compiled/        node-array export (forests only)
+      <root>/<version>/metadata.json    params, metrics, data info
+      <root>/LATEST                     version currently promoted for serving
+      <root>/CANDIDATE                  optional {"version", "fraction"} getting a share of traffic
+    Versions sort chronologically (v<YYYYmmdd-HHMMSSmmm>-<digest>).
+    """
+    def __init__(self, root='models/registry'):
+        self.root = root
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        if not os.path.exists(self.root):
+            return []
+        return sorted(v for v in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, v, METADATA_FILE)))
+
+    def latest(self):
+        try:
+            with open(os.path.join(self.root, LATEST_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            versions = self.versions()
+            return versions[-1] if versions else None
+
+    def metadata(self, version):
+        with open(os.path.join(self.path(version), METADATA_FILE)) as f:
+            return json.load(f)
+
+    def load(self, version=None):
+        version = version or self.latest()
+        if version is None:
+            return None, None
+        return joblib.load(os.path.join(self.path(version), MODEL_FILE)), version
+
+    def register(self, model, metadata, promote=True):
+        """Saves a new version (model, compiled export, metadata) and optionally promotes it."""
+        staging = os.path.join(self.root, f".staging-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(staging)
+        model_file = os.path.join(staging, MODEL_FILE)
+        joblib.dump(model, model_file)
+        digest = file_digest(model_file)
+        if hasattr(model, 'estimators_'):
+            export_forest(model, os.path.join(staging, COMPILED_DIR), source_path=model_file)
+
+        now = time.time()
+        version = f"v{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}-{digest}"
+        metadata = dict(metadata, version=version, model_digest=digest, created_at=time.time())
+        with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        # Rename is atomic, so a watcher never sees a half-written version
+        os.replace(staging, self.path(version))
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version):
+        tmp = os.path.join(self.root, LATEST_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, LATEST_FILE))
+
+    def candidate(self):
+        """(version, fraction of traffic) of the model under A/B test, or (None, 0.0)."""
+        try:
+            with open(os.path.join(self.root, CANDIDATE_FILE)) as f:
+                candidate = json.load(f)
+        except (OSError, ValueError):
+            return None, 0.0
+        return candidate.get('version'), float(candidate.get('fraction', 0.0))
+
+    def set_candidate(self, version, fraction):
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("fraction must be between 0 and 1")
+        if not os.path.exists(os.path.join(self.path(version), METADATA_FILE)):
+            raise ValueError(f"Unknown model version {version}")
+        tmp = os.path.join(self.root, CANDIDATE_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'version': version, 'fraction': fraction}, f)
+        os.replace(tmp, os.path.join(self.root, CANDIDATE_FILE))
+
+    def clear_candidate(self):
+        try:
+            os.remove(os.path.join(self.root, CANDIDATE_FILE))
+        except FileNotFoundError:
+            pass
+
+    def publish(self, version, model_path, compiled_dir):
+        """Copies a version to the fixed serving paths used by RecommenderSystem."""
+        src = self.path(version)
+        tmp_model = model_path + '.tmp'
+        shutil.copyfile(os.path.join(src, MODEL_FILE), tmp_model)
+        os.replace(tmp_model, model_path)
+        if compiled_dir and os.path.exists(os.path.join(src, COMPILED_DIR)):
+            tmp_dir = compiled_dir.rstrip('/') + '.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            shutil.copytree(os.path.join(src, COMPILED_DIR), tmp_dir)
+            shutil.rmtree(compiled_dir, ignore_errors=True)
+            os.replace(tmp_dir, compiled_dir)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect the model registry and choose what is served.")
+    parser.add_argument('--root', default='models/registry')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List versions with their accuracy")
+    promote = commands.add_parser('promote', help="Serve a version to all traffic")
+    promote.add_argument('version')
+    candidate = commands.add_parser('candidate', help="Route a fraction of traffic to a version")
+    candidate.add_argument('version')
+    candidate.add_argument('--fraction', type=float, default=0.1)
+    commands.add_parser('clear-candidate', help="Send all traffic back to the promoted version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        latest = registry.latest()
+        candidate_version, fraction = registry.candidate()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            accuracy = metadata.get('accuracy', metadata.get('accuracy_new_rows'))
+            marker = '*' if version == latest else (f"{fraction:.0%}" if version == candidate_version else '')
+            print(f"{marker:>4} {version}  {metadata.get('family', '')}  "
+                  f"{'' if accuracy is None else f'{accuracy * 100:.2f}%'}")
+    elif args.command == 'promote':
+        registry.promote(args.version)
+        if registry.candidate()[0] == args.version:
+            registry.clear_candidate()
+    elif args.command == 'candidate':
+        registry.set_candidate(args.version, args.fraction)
+    else:
+        registry.clear_candidate()
@@ -1,44 +1,320 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterGrid
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
+from concurrent.futures import ProcessPoolExecutor
 import joblib
 import os
+import sys
+import argparse
 
-def train_crop_model(data_path='crop_recommendation.csv', model_path='models/crop_recommendation_model.pkl'):
+if __package__ in (None, ''):
+    # Allow `python src/model_training.py` as well as `python -m src.model_training`.
+    # Absolute src.* imports keep pickled classes importable from the app.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.compiled_model import export_forest, file_digest
+from src.model_registry import ModelRegistry, LabelEncodedClassifier
+from src.ranking import CALIBRATION_PATH, fit_temperature, save_calibration
+from src.drift import REFERENCE_PATH, build_reference, save_reference
+from src.training_cache import load_training_cache
+
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+LABEL_COLUMN = 'label'
+COMPILED_MODEL_DIR = 'models/crop_recommendation_compiled'
+REGISTRY_DIR = 'models/registry'
+
+# Hyperparameter search space per model family
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [100, 200],
+        'max_depth': [None, 20],
+        'min_samples_leaf': [1, 2],
+    },
+    'xgboost': {
+        'n_estimators': [200],
+        'max_depth': [4, 6],
+        'learning_rate': [0.1],
+    },
+}
+DEFAULT_PARAMS = ('random_forest', {'n_estimators': 100})
+# Read training CSVs through the memory-mapped cache (--no-cache to parse them directly)
+USE_TRAINING_CACHE = True
+
+def build_model(family, params, classes=None, n_jobs=1):
+    if family == 'random_forest':
+        return RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params)
+    if family == 'xgboost':
+        from xgboost import XGBClassifier
+        return LabelEncodedClassifier(XGBClassifier(random_state=42, n_jobs=n_jobs, tree_method='hist', **params),
+                                      classes)
+    raise ValueError(f"Unknown model family: {family}")
+
+def available_families():
+    families = ['random_forest']
+    try:
+        import xgboost  # noqa: F401
+        families.append('xgboost')
+    except ImportError:
+        print("xgboost not installed; searching Random Forest only.")
+    return families
+
+def load_training_data(data_path='crop_recommendation.csv', chunksize=500_000, use_cache=None):
+    """
+    Loads the training CSV as X float32 [rows, 7] and y, an array of crop names.
+    With use_cache, X is a zero-copy view of the memory-mapped training cache
+    (see src/training_cache.py), built on first use and whenever the CSV changes;
+    otherwise the CSV is streamed in chunks.
+    """
+    if USE_TRAINING_CACHE if use_cache is None else use_cache:
+        data = load_training_cache(data_path, chunksize=chunksize)
+        return data.X, data.labels
+    X_parts, y_parts = [], []
+    reader = pd.read_csv(data_path, usecols=FEATURE_COLUMNS + [LABEL_COLUMN],
+                         dtype={c: np.float32 for c in FEATURE_COLUMNS}, chunksize=chunksize)
+    for chunk in reader:
+        # Assuming the synthetic data is clean. Real data would need NaNs handled.
+        chunk = chunk.dropna()
+        X_parts.append(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+        y_parts.append(chunk[LABEL_COLUMN].to_numpy(dtype=object))
+    return np.concatenate(X_parts), np.concatenate(y_parts)
+
+def as_frame(X):
+    # Models are fitted on named columns so RecommenderSystem's DataFrame input matches.
+    # copy=False keeps memory-mapped training data shared instead of copying it.
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False)
+
+def _score_fold(job):
+    family, params, classes, X_train, y_train, X_val, y_val = job
+    model = build_model(family, params, classes)
+    model.fit(as_frame(X_train), y_train)
+    return accuracy_score(y_val, model.predict(as_frame(X_val)))
+
+def hyperparameter_search(X, y, folds=3, n_jobs=None, max_rows=200_000, families=None):
+    """
+    Cross-validated grid search over SEARCH_SPACE. Every (candidate, fold) pair is
+    fitted in its own process. Large datasets are searched on a stratified sample
+    of max_rows; only the winning configuration is fitted on everything.
+    Returns (family, params, mean_accuracy, all_results).
+    """
+    if max_rows and len(X) > max_rows:
+        X, _, y, _ = train_test_split(X, y, train_size=max_rows, stratify=y, random_state=42)
+
+    classes = np.unique(y)
+    candidates = [(family, params) for family in (families or available_families())
+                  for params in ParameterGrid(SEARCH_SPACE[family])]
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X, y))
+    jobs = [(family, params, classes, X[tr], y[tr], X[va], y[va])
+            for family, params in candidates for tr, va in splits]
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        scores = list(pool.map(_score_fold, jobs))
+
+    results = []
+    for i, (family, params) in enumerate(candidates):
+        fold_scores = scores[i * folds:(i + 1) * folds]
+        results.append({'family': family, 'params': params, 'cv_accuracy': float(np.mean(fold_scores))})
+        print(f"  {family:14s} {params} -> {np.mean(fold_scores) * 100:.2f}%")
+    best = max(results, key=lambda r: r['cv_accuracy'])
+    return best['family'], best['params'], best['cv_accuracy'], results
+
+def export_compiled_model(model_path='models/crop_recommendation_model.pkl', compiled_dir=COMPILED_MODEL_DIR, model=None):
+    """
+    Writes the memory-mappable node-array form of the forest used by
+    src/compiled_model.CompiledForest for fast startup and single-row prediction.
+    """
+    if model is None:
+        model = joblib.load(model_path)
+    if not hasattr(model, 'estimators_'):
+        print("Model is not a sklearn forest; skipping compiled export.")
+        return None
+    manifest = export_forest(model, compiled_dir, source_path=model_path)
+    print(f"Compiled model ({manifest['n_trees']} trees, {manifest['n_nodes']} nodes) saved to {compiled_dir}")
+    return manifest
+
+def _publish(model, metadata, model_path, compiled_dir, registry_dir):
+    """Registers a model version and copies it to the serving paths."""
+    if registry_dir:
+        registry = ModelRegistry(registry_dir)
+        version = registry.register(model, metadata)
+        registry.publish(version, model_path, compiled_dir)
+        print(f"Registered model version {version}")
+    else:
+        joblib.dump(model, model_path)
+        if compiled_dir:
+            export_compiled_model(model_path, compiled_dir, model=model)
+    print(f"Model saved to {model_path}")
+
+def fit_calibration(model, X_val, y_val):
+    """Temperature scaling for predict_proba, fitted on held-out rows (see src/ranking.py)."""
+    classes = list(model.classes_)
+    labels = np.array([classes.index(label) for label in y_val])
+    temperature, loss_before, loss_after = fit_temperature(model.predict_proba(as_frame(X_val)), labels)
+    print(f"Calibration: temperature {temperature:.3f}, log-loss {loss_before:.4f} -> {loss_after:.4f}")
+    return {'temperature': temperature, 'log_loss_before': loss_before, 'log_loss_after': loss_after}
+
+def calibrate_model(data_path='crop_recommendation.csv', model_path='models/crop_recommendation_model.pkl',
+                    calibration_path=CALIBRATION_PATH, chunksize=500_000):
+    """Fits calibration for the current model on the same held-out split training uses."""
+    X, y = load_training_data(data_path, chunksize=chunksize)
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    calibration = fit_calibration(joblib.load(model_path), X_test, y_test)
+    save_calibration(calibration_path, file_digest(model_path), calibration['temperature'],
+                     calibration['log_loss_before'], calibration['log_loss_after'])
+    print(f"Calibration saved to {calibration_path}")
+    return calibration
+
+def train_crop_model(data_path='crop_recommendation.csv', model_path='models/crop_recommendation_model.pkl',
+                     compiled_dir=COMPILED_MODEL_DIR, registry_dir=REGISTRY_DIR, search=False, n_jobs=-1,
+                     chunksize=500_000, calibration_path=CALIBRATION_PATH, drift_reference_path=REFERENCE_PATH):
     if not os.path.exists('models'):
         os.makedirs('models')
-        
+
     # Load dataset
-    df = pd.read_csv(data_path)
-    
-    # Preprocessing
-    # Assuming the synthetic data is clean. Real data would need NaNs handled.
-    X = df[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']]
-    y = df['label']
-    
+    X, y = load_training_data(data_path, chunksize=chunksize)
+
     # Train-Test Split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Model Initialization
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    
+
+    # Model Selection
+    family, params = DEFAULT_PARAMS
+    search_results = None
+    if search:
+        print("Running cross-validated hyperparameter search...")
+        family, params, _, search_results = hyperparameter_search(
+            X_train, y_train, n_jobs=None if n_jobs == -1 else n_jobs)
+    model = build_model(family, params, np.unique(y), n_jobs=n_jobs)
+
     # Training
-    print("Training Random Forest Scheme...")
-    rf.fit(X_train, y_train)
-    
+    print(f"Training {family} {params}...")
+    model.fit(as_frame(X_train), y_train)
+
     # Evaluation
-    y_pred = rf.predict(X_test)
+    y_pred = model.predict(as_frame(X_test))
     acc = accuracy_score(y_test, y_pred)
     print(f"Model Accuracy: {acc*100:.2f}%")
     print("\nClassification Report:\n", classification_report(y_test, y_pred))
-    
+    calibration = fit_calibration(model, X_test, y_test)
+
     # Save Model
-    joblib.dump(rf, model_path)
-    print(f"Model saved to {model_path}")
-    
-    return rf, acc
+    metadata = {
+        'family': family,
+        'params': params,
+        'accuracy': acc,
+        'data_path': data_path,
+        'rows': int(len(X)),
+        'search': search_results,
+        'calibration': calibration,
+    }
+    _publish(model, metadata, model_path, compiled_dir, registry_dir)
+    if calibration_path:
+        # Tied to the published pickle; RecommenderSystem ignores it for any other model
+        save_calibration(calibration_path, file_digest(model_path), calibration['temperature'],
+                         calibration['log_loss_before'], calibration['log_loss_after'])
+    if drift_reference_path:
+        # Live inputs are compared against this sketch of the training data (see src/drift.py)
+        save_reference(build_reference(X, y, source=data_path), drift_reference_path)
+
+    return model, acc
+
+def _holdout_split(X, y, fraction, seed):
+    """train_test_split, stratified whenever every class has enough rows for it."""
+    counts = np.unique(y, return_counts=True)[1]
+    stratify = y if counts.min() >= 2 and int(len(y) * fraction) >= len(counts) else None
+    return train_test_split(X, y, test_size=fraction, stratify=stratify, random_state=seed)
+
+def update_model(new_data_path, base_data_path='crop_recommendation.csv', model_path='models/crop_recommendation_model.pkl',
+                 compiled_dir=COMPILED_MODEL_DIR, registry_dir=REGISTRY_DIR, new_trees=20, replay_rows=20_000,
+                 n_jobs=-1, chunksize=500_000, holdout=0.2, calibration_path=CALIBRATION_PATH,
+                 drift_reference_path=REFERENCE_PATH):
+    """
+    Incremental update for newly labelled rows: instead of refitting from scratch,
+    the current forest is warm-started with `new_trees` extra trees fitted on the
+    new rows plus a stratified replay sample of the base data (which keeps every
+    crop class represented, as the existing trees require).
+
+    A `holdout` share of the new rows and the base data's usual test split are kept
+    out of the fit; accuracy and the probability calibration come from those rows.
+    The drift reference is rebuilt from the base and new rows together.
+    """
+    registry = ModelRegistry(registry_dir) if registry_dir else None
+    model, base_version = registry.load() if registry else (None, None)
+    if model is None:
+        model = joblib.load(model_path)
+    if not isinstance(model, RandomForestClassifier):
+        raise ValueError("Incremental updates are only supported for Random Forest models; retrain instead.")
+
+    X_new, y_new = load_training_data(new_data_path, chunksize=chunksize)
+    unknown = set(np.unique(y_new)) - set(model.classes_)
+    if unknown:
+        raise ValueError(f"New rows contain unseen crops {sorted(unknown)}; a full retrain is required.")
+    if len(X_new) < 2:
+        raise ValueError("Need at least 2 new rows (some are held out to score the update).")
+    X_new_fit, X_new_val, y_new_fit, y_new_val = _holdout_split(X_new, y_new, holdout, len(model.estimators_))
+
+    X_base_all, y_base_all = load_training_data(base_data_path, chunksize=chunksize)
+    # Same split as train_crop_model, so the base test rows stay unseen
+    X_base, X_base_val, y_base, y_base_val = train_test_split(X_base_all, y_base_all, test_size=0.2, random_state=42)
+    if replay_rows and len(X_base) > replay_rows:
+        X_base, _, y_base, _ = train_test_split(X_base, y_base, train_size=replay_rows, stratify=y_base,
+                                                random_state=len(model.estimators_))
+    X_fit = np.concatenate([X_new_fit, X_base])
+    y_fit = np.concatenate([y_new_fit, y_base])
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees, n_jobs=n_jobs)
+    print(f"Adding {new_trees} trees on {len(X_new_fit)} new rows (+{len(X_base)} replayed)...")
+    model.fit(as_frame(X_fit), y_fit)
+    model.set_params(warm_start=False)
+
+    acc_new = accuracy_score(y_new_val, model.predict(as_frame(X_new_val)))
+    acc_base = accuracy_score(y_base_val, model.predict(as_frame(X_base_val)))
+    print(f"Accuracy on {len(X_new_val)} held-out new rows: {acc_new*100:.2f}%, "
+          f"on the base test split: {acc_base*100:.2f}%")
+    calibration = fit_calibration(model, np.concatenate([X_new_val, X_base_val]),
+                                  np.concatenate([y_new_val, y_base_val]))
+    metadata = {
+        'family': 'random_forest',
+        'params': {'n_estimators': len(model.estimators_)},
+        'accuracy': acc_base,
+        'accuracy_new_rows': acc_new,
+        'data_path': new_data_path,
+        'rows': int(len(X_new)),
+        'parent_version': base_version,
+        'calibration': calibration,
+    }
+    _publish(model, metadata, model_path, compiled_dir, registry_dir)
+    if calibration_path:
+        save_calibration(calibration_path, file_digest(model_path), calibration['temperature'],
+                         calibration['log_loss_before'], calibration['log_loss_after'])
+    if drift_reference_path:
+        # The model now reflects the new rows too
+        save_reference(build_reference(np.concatenate([X_base_all, X_new]), np.concatenate([y_base_all, y_new]),
+                                       source=f"{base_data_path}+{new_data_path}"), drift_reference_path)
+    return model, acc_new
 
 if __name__ == "__main__":
-    train_crop_model()
+    parser = argparse.ArgumentParser(description="Train the crop recommendation model.")
+    parser.add_argument('--data', default='crop_recommendation.csv')
+    parser.add_argument('--search', action='store_true',
+                        help="Run a cross-validated hyperparameter search (process pool) before the final fit")
+    parser.add_argument('--update', metavar='NEW_CSV',
+                        help="Warm-start the current model with newly labelled rows instead of retraining")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Parse the CSVs directly instead of through the memory-mapped training cache")
+    parser.add_argument('--export-only', action='store_true',
+                        help="Skip training; compile the existing model pickle for fast serving")
+    parser.add_argument('--calibrate', action='store_true',
+                        help="Skip training; fit probability calibration for the existing model")
+    args = parser.parse_args()
+    USE_TRAINING_CACHE = not args.no_cache
+    if args.export_only:
+        export_compiled_model()
+    elif args.calibrate:
+        calibrate_model(args.data, chunksize=args.chunksize)
+    elif args.update:
+        update_model(args.update, base_data_path=args.data, n_jobs=args.n_jobs, chunksize=args.chunksize)
+    else:
+        train_crop_model(args.data, search=args.search, n_jobs=args.n_jobs, chunksize=args.chunksize)
@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Rolling windows (in days) used for the trend features
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+EMPTY_DAY = np.iinfo(np.int32).min
+
+FEATURE_NAMES = ['latest_price', 'avg_7d', 'avg_30d', 'momentum', 'volatility', 'n_obs', 'last_day']
+
+
+def to_days(dates):
+    """Converts a date column to int32 days since 1970-01-01."""
+    return pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int32)
+
+
+class PriceStore:
+    """
+    Columnar, date-partitioned store for daily mandi prices.
+
+    Raw rows live under <root>/partitions/<YYYY-MM>/<chunk>/ as three .npy columns
+    (series id, day, price) that are opened memory-mapped. Alongside them the store
+    keeps a small ring buffer of the last LONG_WINDOW days for every
+    (district, commodity) series, so rolling averages, momentum and volatility are
+    updated incrementally as new days arrive instead of rescanning history.
+
+    With root=None the store is kept in memory only (used for plain CSV input).
+    """
+    def __init__(self, root=None):
+        self.root = root
+        self.series = []          # series id -> (district, commodity)
+        self.series_ids = {}      # (district, commodity) -> series id
+        self.ring_price = np.zeros((0, LONG_WINDOW), dtype=np.float32)
+        self.ring_day = np.full((0, LONG_WINDOW), EMPTY_DAY, dtype=np.int32)
+        self.last_day = np.full(0, EMPTY_DAY, dtype=np.int32)
+        self.features = {name: np.zeros(0) for name in FEATURE_NAMES}
+        if root and os.path.exists(self.state_path):
+            self._load_state()
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+    @property
+    def state_path(self):
+        return os.path.join(self.root, 'state.npz')
+
+    @property
+    def series_path(self):
+        return os.path.join(self.root, 'series.json')
+
+    @property
+    def partitions_dir(self):
+        return os.path.join(self.root, 'partitions')
+
+    @classmethod
+    def version_of(cls, root):
+        """Changes whenever a new ingest is committed to the store at root."""
+        if not root:
+            return None
+        try:
+            stat = os.stat(os.path.join(root, 'state.npz'))
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def ingest_csv(self, csv_path, chunksize=1_000_000):
+        """Streams a District,Commodity,Date,Modal_Price CSV into the store."""
+        reader = pd.read_csv(csv_path, usecols=['District', 'Commodity', 'Date', 'Modal_Price'],
+                             chunksize=chunksize)
+        rows = 0
+        for chunk in reader:
+            rows += self._ingest_frame(chunk)
+        self.commit()
+        return rows
+
+    def ingest(self, df):
+        """Adds new rows (e.g. today's prices) and refreshes the trend features."""
+        rows = self._ingest_frame(df)
+        self.commit()
+        return rows
+
+    def _ingest_frame(self, df):
+        if df.empty:
+            return 0
+        series = self._series_for(df['District'], df['Commodity'])
+        days = to_days(df['Date'])
+        prices = df['Modal_Price'].to_numpy(dtype=np.float32)
+        if self.root:
+            self._write_partitions(series, days, prices)
+        self._update_rings(series, days, prices)
+        return len(df)
+
+    def _series_for(self, districts, commodities):
+        # Factorize both columns so the Python-level work is per distinct pair, not per row
+        d_codes, d_uniques = pd.factorize(districts)
+        c_codes, c_uniques = pd.factorize(commodities)
+        combined = d_codes.astype(np.int64) * len(c_uniques) + c_codes
+        uniques, inverse = np.unique(combined, return_inverse=True)
+        ids = np.empty(len(uniques), dtype=np.int32)
+        for i, code in enumerate(uniques):
+            key = (str(d_uniques[code // len(c_uniques)]), str(c_uniques[code % len(c_uniques)]))
+            if key not in self.series_ids:
+                self.series_ids[key] = len(self.series)
+                self.series.append(key)
+            ids[i] = self.series_ids[key]
+        self._grow(len(self.series))
+        return ids[inverse.reshape(-1)]
+
+    def _grow(self, n_series):
+        extra = n_series - len(self.last_day)
+        if extra <= 0:
+            return
+        self.ring_price = np.vstack([self.ring_price, np.zeros((extra, LONG_WINDOW), dtype=np.float32)])
+        self.ring_day = np.vstack([self.ring_day, np.full((extra, LONG_WINDOW), EMPTY_DAY, dtype=np.int32)])
+        self.last_day = np.concatenate([self.last_day, np.full(extra, EMPTY_DAY, dtype=np.int32)])
+
+    def _write_partitions(self, series, days, prices):
+        months = days.astype('datetime64[D]').astype('datetime64[M]')
+        for month in np.unique(months):
+            mask = months == month
+            month_dir = os.path.join(self.partitions_dir, str(month))
+            os.makedirs(month_dir, exist_ok=True)
+            chunk_dir = os.path.join(month_dir, f"chunk-{len(os.listdir(month_dir)):05d}")
+            os.makedirs(chunk_dir)
+            np.save(os.path.join(chunk_dir, 'series.npy'), series[mask])
+            np.save(os.path.join(chunk_dir, 'day.npy'), days[mask])
+            np.save(os.path.join(chunk_dir, 'price.npy'), prices[mask])
+
+    def _update_rings(self, series, days, prices):
+        # Each day lands in slot (day % LONG_WINDOW). When several rows target the same
+        # slot only the most recent day is kept; rows older than what the slot already
+        # holds are ignored, so out-of-order history is safe to ingest.
+        order = np.argsort(days, kind='stable')
+        series, days, prices = series[order], days[order], prices[order]
+        slots = days % LONG_WINDOW
+        flat = series.astype(np.int64) * LONG_WINDOW + slots
+        _, last_of_key = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last_of_key
+        series, days, prices, slots = series[keep], days[keep], prices[keep], slots[keep]
+
+        newer = days >= self.ring_day[series, slots]
+        series, days, prices, slots = series[newer], days[newer], prices[newer], slots[newer]
+        self.ring_price[series, slots] = prices
+        self.ring_day[series, slots] = days
+        np.maximum.at(self.last_day, series, days)
+
+    # ------------------------------------------------------------------
+    # Features
+    # ------------------------------------------------------------------
+    def _compute_features(self):
+        n_series = len(self.last_day)
+        age = self.last_day[:, None].astype(np.int64) - self.ring_day
+        valid = (self.ring_day != EMPTY_DAY) & (age >= 0) & (age < LONG_WINDOW)
+        recent = valid & (age < SHORT_WINDOW)
+        prices = self.ring_price.astype(np.float64)
+
+        n_long = valid.sum(axis=1)
+        n_short = recent.sum(axis=1)
+        avg_long = np.where(valid, prices, 0).sum(axis=1) / np.maximum(n_long, 1)
+        avg_short = np.where(recent, prices, 0).sum(axis=1) / np.maximum(n_short, 1)
+        sq_long = np.where(valid, prices ** 2, 0).sum(axis=1) / np.maximum(n_long, 1)
+        std_long = np.sqrt(np.maximum(sq_long - avg_long ** 2, 0))
+
+        has_history = n_long >= 2
+        safe_avg = np.where(avg_long > 0, avg_long, 1)
+        latest_slot = np.where(self.last_day == EMPTY_DAY, 0, self.last_day % LONG_WINDOW)
+
+        self.features = {
+            'latest_price': prices[np.arange(n_series), latest_slot],
+            'avg_7d': avg_short,
+            'avg_30d': avg_long,
+            'momentum': np.where(has_history, avg_short / safe_avg - 1, 0.0),
+            'volatility': np.where(has_history, std_long / safe_avg, 0.0),
+            'n_obs': n_long,
+            'last_day': self.last_day.copy(),
+        }
+
+    def feature_rows(self):
+        """Yields (district, commodity, {feature: value}) for every series."""
+        for sid, (district, commodity) in enumerate(self.series):
+            yield district, commodity, {name: self.features[name][sid].item() for name in FEATURE_NAMES}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def commit(self):
+        """Recomputes features and (for on-disk stores) atomically replaces the state file."""
+        self._compute_features()
+        if not self.root:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp_series = self.series_path + '.tmp'
+        with open(tmp_series, 'w') as f:
+            json.dump(self.series, f)
+        tmp_state = self.state_path + '.tmp.npz'
+        np.savez(tmp_state, ring_price=self.ring_price, ring_day=self.ring_day,
+                 last_day=self.last_day, **{'feature_' + name: self.features[name] for name in FEATURE_NAMES})
+        # series.json first: it only ever grows, so an old state still matches it
+        os.replace(tmp_series, self.series_path)
+        os.replace(tmp_state, self.state_path)
+
+    def _load_state(self):
+        with open(self.series_path) as f:
+            self.series = [tuple(key) for key in json.load(f)]
+        self.series_ids = {key: sid for sid, key in enumerate(self.series)}
+        with np.load(self.state_path) as state:
+            self.ring_price = state['ring_price']
+            self.ring_day = state['ring_day']
+            self.last_day = state['last_day']
+            self.features = {name: state['feature_' + name] for name in FEATURE_NAMES}
+        # State may have been written before the newest series were appended
+        n = len(self.last_day)
+        self.series = self.series[:n]
+        self.series_ids = {key: sid for sid, key in enumerate(self.series)}
+
+    # ------------------------------------------------------------------
+    # Raw history
+    # ------------------------------------------------------------------
+    def scan(self, start=None, end=None):
+        """
+        Yields memory-mapped (series, day, price) column chunks whose month
+        falls within [start, end] (ISO date strings, both optional).
+        """
+        if not self.root or not os.path.exists(self.partitions_dir):
+            return
+        start_month = np.datetime64(start, 'M') if start else None
+        end_month = np.datetime64(end, 'M') if end else None
+        for month in sorted(os.listdir(self.partitions_dir)):
+            m = np.datetime64(month, 'M')
+            if (start_month is not None and m < start_month) or (end_month is not None and m > end_month):
+                continue
+            month_dir = os.path.join(self.partitions_dir, month)
+            for chunk in sorted(os.listdir(month_dir)):
+                chunk_dir = os.path.join(month_dir, chunk)
+                yield (np.load(os.path.join(chunk_dir, 'series.npy'), mmap_mode='r'),
+                       np.load(os.path.join(chunk_dir, 'day.npy'), mmap_mode='r'),
+                       np.load(os.path.join(chunk_dir, 'price.npy'), mmap_mode='r'))
+
+    def rebuild(self):
+        """Recomputes the rolling state from the raw partitions."""
+        self._grow(len(self.series))
+        self.ring_price[:] = 0
+        self.ring_day[:] = EMPTY_DAY
+        self.last_day[:] = EMPTY_DAY
+        for series, days, prices in self.scan():
+            self._update_rings(np.asarray(series), np.asarray(days), np.asarray(prices))
+        self.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load Agmarknet price history into the columnar price store.")
+    parser.add_argument('csv', nargs='?', default='market_prices.csv')
+    parser.add_argument('--root', default='data/price_store')
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    parser.add_argument('--rebuild', action='store_true', help="Recompute trend state from stored partitions")
+    args = parser.parse_args()
+
+    store = PriceStore(args.root)
+    if args.rebuild:
+        store.rebuild()
+        print(f"Rebuilt trend state for {len(store.series)} series.")
+    else:
+        rows = store.ingest_csv(args.csv, chunksize=args.chunksize)
+        print(f"Ingested {rows} rows into {args.root} ({len(store.series)} series).")
+
+
+if __name__ == "__main__":
+    main()
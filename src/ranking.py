@@ -0,0 +1,237 @@
+"""
+Multi-objective crop ranking over every class the model knows.
+
+    score = w_suitability * p  +  (w_revenue * revenue - w_cost * fertilizer cost) / district max revenue
+
+p is the calibrated model probability, revenue the expected INR/acre (market price x
+yield from crop_yields.csv) and fertilizer cost the INR/acre needed to reach the
+crop's NPK target. Crops below `min_probability` are never ranked, so a profitable
+crop only surfaces where the soil and weather actually suit it.
+"""
+import csv
+import json
+import os
+import numpy as np
+
+DEFAULT_WEIGHTS = {'suitability': 0.6, 'revenue': 0.3, 'cost': 0.1}
+DEFAULT_MIN_PROBABILITY = 0.05
+CALIBRATION_PATH = 'models/crop_recommendation_calibration.json'
+
+# Probability floor for the calibration log-loss (forest probabilities are often exactly 0)
+_EPS = 1e-6
+
+
+def parse_weights(text):
+    """'suitability=0.6,revenue=0.3,cost=0.1' -> dict; unknown names raise ValueError."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_WEIGHTS:
+            raise ValueError(f"Unknown ranking weight '{name}' (expected {', '.join(DEFAULT_WEIGHTS)})")
+        weights[name] = float(value)
+    return weights
+
+
+def load_yields(path='crop_yields.csv'):
+    """Crop -> yield per acre, in the unit market prices are quoted in (quintal, or tonne for sugarcane)."""
+    yields = {}
+    if not os.path.exists(path):
+        print(f"Crop yields not found at {path}; ranking without expected revenue.")
+        return yields
+    with open(path, newline='') as f:
+        for record in csv.DictReader(f):
+            yields[record['Crop']] = float(record['Yield_per_acre'])
+    return yields
+
+
+def apply_temperature(probs, temperature):
+    """Temperature scaling on probabilities: p^(1/T), renormalised per row. T > 1 softens."""
+    if temperature == 1.0:
+        return probs
+    scaled = np.power(probs, 1.0 / temperature)
+    total = scaled.sum(axis=-1, keepdims=True)
+    return scaled / np.where(total > 0, total, 1.0)
+
+
+def fit_temperature(probs, labels, grid=None):
+    """
+    Temperature minimising the log-loss of held-out predictions.
+    probs: [rows, classes]; labels: [rows] class indices
+    Returns (temperature, log-loss before, log-loss after).
+    """
+    probs = np.asarray(probs, dtype=float)
+    rows = np.arange(len(probs))
+
+    def log_loss(temperature):
+        return float(-np.log(np.maximum(apply_temperature(probs, temperature)[rows, labels], _EPS)).mean())
+
+    grid = np.exp(np.linspace(np.log(0.25), np.log(8.0), 61)) if grid is None else grid
+    losses = [log_loss(t) for t in grid]
+    best = int(np.argmin(losses))
+    return float(grid[best]), log_loss(1.0), losses[best]
+
+
+def save_calibration(path, model_version, temperature, loss_before=None, loss_after=None):
+    with open(path, 'w') as f:
+        json.dump({'method': 'temperature', 'model_version': model_version, 'temperature': temperature,
+                   'log_loss_before': loss_before, 'log_loss_after': loss_after}, f, indent=2)
+
+
+def load_calibration(path, model_version):
+    """Fitted temperature for this model version; 1.0 (uncalibrated) when missing or stale."""
+    if not path or not os.path.exists(path):
+        return 1.0
+    with open(path) as f:
+        calibration = json.load(f)
+    if calibration.get('model_version') != model_version:
+        print("Calibration was fitted for a different model; ranking with raw probabilities.")
+        return 1.0
+    return float(calibration['temperature'])
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first, for one row [classes] or many
+    [rows, classes]. Equal scores go to the lower class index (classes_ is sorted,
+    so alphabetical), so single, batch and lookup-table answers agree.
+    """
+    return np.argsort(-np.asarray(scores), axis=-1, kind='stable')[..., :k]
+
+
+class RankingEngine:
+    """
+    Ranks all crop classes for one or many farms in a single vectorized pass.
+    Per district, the market info, expected revenue and fertilizer prices of every
+    class are computed once per market-data version, so ranking a request is a few
+    array ops over [classes] (or [rows, classes] for a batch).
+    """
+    def __init__(self, classes, market_service, fertilizer_engine, weights=None, top_k=3,
+                 min_probability=DEFAULT_MIN_PROBABILITY, temperature=1.0, yields_path='crop_yields.csv'):
+        self.classes = [str(c) for c in classes]
+        self.market_service = market_service
+        self.fertilizer_engine = fertilizer_engine
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.top_k = top_k
+        self.min_probability = min_probability
+        self.temperature = temperature
+        yields = load_yields(yields_path)
+        missing = [crop for crop in self.classes if crop not in yields]
+        if yields and missing:
+            print(f"No yield for {', '.join(missing)}; their expected revenue counts as 0.")
+        self.yields = np.array([yields.get(crop, 0.0) for crop in self.classes])
+        self._district_tables = (None, {})  # (market data version, district -> table)
+        self._soil_targets = {}
+
+    @property
+    def version(self):
+        """Identifies the ranking configuration, e.g. for cache keys."""
+        weights = ','.join(f"{name}={self.weights[name]}" for name in sorted(self.weights))
+        return f"multi:{weights}:k{self.top_k}:min{self.min_probability}:t{self.temperature}"
+
+    def district_table(self, district):
+        """
+        Market info, expected revenue [classes] and fertilizer prices for one district,
+        plus the revenue part of the score and the weight per rupee of fertilizer.
+        """
+        version = self.market_service.data_version()
+        table_version, tables = self._district_tables
+        if table_version != version:
+            # New price data: start a fresh set of tables (swapped in whole)
+            tables = {}
+            self._district_tables = (version, tables)
+        table = tables.get(district)
+        if table is None:
+            info = [self.market_service.get_price_prediction(crop, district) for crop in self.classes]
+            revenue = np.array([market['current_price'] for market in info], dtype=float) * self.yields
+            # Money terms are scaled by the district's best revenue so weights compare with probabilities
+            scale = max(float(revenue.max()), 1.0)
+            table = tables[district] = {
+                'info': info,
+                'revenue': revenue,
+                'revenue_score': self.weights['revenue'] * revenue / scale,
+                'cost_weight': self.weights['cost'] / scale,
+                'fertilizer_prices': np.array(self.fertilizer_engine.prices_for(district)),
+            }
+        return table
+
+    def precompute(self, districts):
+        for district in districts:
+            self.district_table(district)
+
+    def soil_targets(self, soil_type):
+        """NPK targets [classes, 3] of every class on this soil type."""
+        targets = self._soil_targets.get(soil_type)
+        if targets is None:
+            engine = self.fertilizer_engine
+            rows = [engine.target_row(crop, soil_type) for crop in self.classes]
+            targets = self._soil_targets[soil_type] = engine.targets[rows]
+        return targets
+
+    def _score(self, probs, revenue_score, cost_weight, cost):
+        score = self.weights['suitability'] * probs + revenue_score - cost_weight * cost
+        # The model's own favourite always stays eligible
+        eligible = (probs >= self.min_probability) | (probs == probs.max(axis=-1, keepdims=True))
+        return np.where(eligible, score, -np.inf)
+
+    def rank(self, district, probs, soil_npk, soil_type=None):
+        """probs: [classes] model probabilities (model.classes_ order); soil_npk: (N, P, K)."""
+        probs = apply_temperature(np.asarray(probs, dtype=float), self.temperature)
+        table = self.district_table(district)
+        cost = self.fertilizer_engine.input_costs(self.soil_targets(soil_type), np.asarray(soil_npk, dtype=float),
+                                                  table['fertilizer_prices'])
+        score = self._score(probs, table['revenue_score'], table['cost_weight'], cost)
+        top = top_k_indices(score, self.top_k)
+        return self._entries(table, top.tolist(), probs, cost, score)
+
+    def rank_batch(self, districts, probs, soil_npk, soil_types=None):
+        """
+        districts: [rows]; probs: [rows, classes]; soil_npk: [rows, 3]; soil_types: [rows] or None
+        Returns one list of ranked entries (best first, at most top_k) per row, as rank() would.
+        """
+        probs = apply_temperature(np.asarray(probs, dtype=float), self.temperature)
+        soil_npk = np.asarray(soil_npk, dtype=float).reshape(-1, 3)
+        if soil_types is None:
+            soil_types = [None] * len(districts)
+
+        # Gather the per-district and per-soil tables row by row
+        unique_districts = {}
+        district_ids = np.array([unique_districts.setdefault(d, len(unique_districts)) for d in districts])
+        tables = [self.district_table(d) for d in unique_districts]
+        revenue_score = np.stack([table['revenue_score'] for table in tables])[district_ids]
+        cost_weight = np.array([table['cost_weight'] for table in tables])[district_ids, None]
+        fertilizer_prices = np.stack([table['fertilizer_prices'] for table in tables])[district_ids]
+        unique_soils = {}
+        soil_ids = np.array([unique_soils.setdefault(s, len(unique_soils)) for s in soil_types])
+        targets = np.stack([self.soil_targets(s) for s in unique_soils])[soil_ids]
+
+        cost = self.fertilizer_engine.input_costs(targets, soil_npk[:, None, :], fertilizer_prices[:, None, :])
+        score = self._score(probs, revenue_score, cost_weight, cost)
+
+        # Same ordering and tie-break as rank(), including ties at the k-th place
+        top_indices = top_k_indices(score, self.top_k)
+
+        return [self._entries(tables[district_ids[row]], top.tolist(), probs[row], cost[row], score[row])
+                for row, top in enumerate(top_indices)]
+
+    def _entries(self, table, indices, probs, cost, score):
+        info, revenue = table['info'], table['revenue']
+        entries = []
+        for idx in indices:
+            if score[idx] == -np.inf:
+                break
+            market = info[idx]
+            entries.append({
+                'crop': self.classes[idx],
+                'confidence': round(float(probs[idx]) * 100, 2),
+                'market_price': market['current_price'],
+                'price_trend': market['trend'],
+                'market_score': market['profitability_score'],
+                'expected_revenue': round(float(revenue[idx]), 2),
+                'fertilizer_cost': round(float(cost[idx]), 2),
+                'net_return': round(float(revenue[idx] - cost[idx]), 2),
+                'final_score': round(float(score[idx]) * 100, 2),
+            })
+        return entries
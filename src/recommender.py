@@ -1,54 +1,351 @@
 import pandas as pd
 import numpy as np
+import copy
 import joblib
 import os
 from .api_integration import WeatherService, MarketService
+from .compiled_model import CompiledForest, file_digest
+from .lookup_table import LookupTable, TIE_BREAK
+from .metrics import REGISTRY, stage
 from .fertilizer_engine import FertilizerEngine
+from .ranking import RankingEngine, CALIBRATION_PATH, load_calibration, top_k_indices
+
+# Column order the model was trained on (see src/model_training.py)
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+DEFAULT_WEATHER = {'temperature': 30, 'humidity': 80, 'rainfall': 200}
+TOP_K = 3
+
+LOOKUP_REQUESTS = REGISTRY.counter(
+    'crop_lookup_table_requests', 'Single recommendations answered from the lookup table (hit) or the model (miss).',
+    ['result'])
+
 
 class RecommenderSystem:
-    def __init__(self, model_path='models/crop_recommendation_model.pkl'):
+    def __init__(self, model_path='models/crop_recommendation_model.pkl', cache=None,
+                 compiled_path='models/crop_recommendation_compiled', engine='auto', fertilizer_mode='greedy',
+                 fertilizer_prices=None, lookup_path='models/lookup_table', ranking='blend', ranking_options=None,
+                 calibration_path=CALIBRATION_PATH, drift_monitor=None):
+        """
+        cache:  optional RecommendationCache (see src/cache.py) placed in front of get_recommendation
+        ranking: 'blend' -> model top 3 re-ranked by 70% confidence + 30% market score
+                 'multi' -> every crop ranked on calibrated probability, expected revenue and
+                            fertilizer cost (see src/ranking.py); ranking_options are passed to
+                            RankingEngine (weights, top_k, min_probability)
+        lookup_path: precomputed grid table (see src/lookup_table.py), used for exact grid hits when
+                     built from the current model and weather; None to always run the model
+        fertilizer_mode: 'greedy' or 'least_cost' (see FertilizerEngine)
+        fertilizer_prices: optional District,Fertilizer,Price_per_kg CSV; default subsidised rates otherwise
+        drift_monitor: optional DriftMonitor (see src/drift.py) fed with every scored request
+        engine: 'compiled' -> memory-mapped CompiledForest (see src/compiled_model.py)
+                'sklearn'  -> unpickled sklearn model
+                'auto'     -> compiled when an up-to-date export exists, else sklearn
+        """
         self.model_path = model_path
+        self.compiled_path = compiled_path
+        self.engine = engine
         self.model = None
+        self.model_version = None
+        self.cache = cache
         self.weather_service = WeatherService(mock=True)
         self.market_service = MarketService(mock=True)
-        self.fertilizer_engine = FertilizerEngine()
+        self.fertilizer_engine = FertilizerEngine(mode=fertilizer_mode, price_path=fertilizer_prices)
+        self.lookup_path = lookup_path
+        self.lookup_table = None
+        self.ranking = ranking
+        self.ranking_options = ranking_options or {}
+        self.calibration_path = calibration_path
+        self.ranker = None
+        self.drift_monitor = drift_monitor
         self.load_model()
         
+    def _load_compiled(self):
+        """Returns the CompiledForest to serve from, or None to use the sklearn pickle."""
+        if self.engine == 'sklearn' or not CompiledForest.exists(self.compiled_path):
+            return None
+        compiled = CompiledForest(self.compiled_path)
+        if self.engine == 'compiled' or not os.path.exists(self.model_path):
+            return compiled
+        # The export records which pickle it came from; a mismatch means the model
+        # was retrained without re-exporting
+        if compiled.model_version != file_digest(self.model_path):
+            print("Compiled model does not match the pickle; falling back to sklearn.")
+            return None
+        return compiled
+
     def load_model(self):
-        if os.path.exists(self.model_path):
+        compiled = self._load_compiled()
+        if compiled is not None:
+            self.model = compiled
+            self.model_version = compiled.model_version or 'compiled'
+            print("Compiled model loaded successfully.")
+        elif os.path.exists(self.model_path):
             self.model = joblib.load(self.model_path)
+            self.model_version = file_digest(self.model_path)
             print("Model loaded successfully.")
         else:
             print(f"Model not found at {self.model_path}. Please train first.")
+        self.ranker = self._load_ranker()
+        # The table only stores each cell's top 3, which full ranking cannot use
+        self.lookup_table = self._load_lookup_table() if self.ranker is None else None
+
+    def with_model(self, model_path, compiled_path):
+        """
+        Another RecommenderSystem serving a different model file, sharing this one's
+        weather, market and fertilizer services and cache (keys carry the model version).
+        Used by ModelManager to load new versions next to the one being served.
+        """
+        other = copy.copy(self)
+        other.model_path = model_path
+        other.compiled_path = compiled_path
+        other.model = None
+        other.model_version = None
+        other.load_model()
+        return other
+
+    def _load_ranker(self):
+        if not self.model or self.ranking != 'multi':
+            return None
+        temperature = load_calibration(self.calibration_path, self.model_version)
+        return RankingEngine(self.model.classes_, self.market_service, self.fertilizer_engine,
+                             temperature=temperature, **self.ranking_options)
+
+    @property
+    def cache_version(self):
+        """Model version plus the ranking configuration, so cached results never mix rankings."""
+        if self.ranker is None:
+            return self.model_version
+        return f"{self.model_version}|{self.ranker.version}"
+
+    def _load_lookup_table(self):
+        if not self.model or not self.lookup_path or not LookupTable.exists(self.lookup_path):
+            return None
+        table = LookupTable(self.lookup_path)
+        if (table.model_version != self.model_version
+                or table.weather_version != self.weather_service.static_version()
+                or table.classes != [str(c) for c in self.model.classes_]
+                or table.tie_break != TIE_BREAK):
+            print("Lookup table is stale (model or weather changed); using live inference only.")
+            return None
+        print("Lookup table loaded successfully.")
+        return table
             
+    def warm_up(self, district='Coimbatore'):
+        """
+        Runs one recommendation end to end (bypassing the cache) so model pages,
+        price tables and lazily-built structures are touched before serving.
+        """
+        if self.model:
+            if self.ranker is not None:
+                self.ranker.precompute(self.weather_service.districts)
+            # Warm-up traffic is not live traffic; keep it out of the drift sketches
+            monitor, self.drift_monitor = self.drift_monitor, None
+            try:
+                self._recommend(district, 90, 45, 40, 6.5, 'Loamy')
+            finally:
+                self.drift_monitor = monitor
+
     def get_recommendation(self, district, n, p, k, ph=6.5, soil_type="Loamy"):
         if not self.model:
             return {"error": "Model not loaded"}
 
+        if self.cache is not None:
+            with stage('cache_lookup'):
+                cache_key = self.cache.make_key(self.cache_version, self.market_service.data_version(),
+                                                district, n, p, k, ph, soil_type)
+                cached = self.cache.get_entry(cache_key)
+            if cached is not None:
+                self._record_drift(cached['result'], cached['predicted_crop'])
+                return cached['result']
+            result, predicted = self._recommend(district, n, p, k, ph, soil_type)
+            self.cache.set(cache_key, result, predicted)
+            return result
+
+        return self._recommend(district, n, p, k, ph, soil_type)[0]
+
+    def _recommend(self, district, n, p, k, ph, soil_type):
+        """Returns (result, the model's own top crop)."""
         # 1. Get Environmental Data
-        weather = self.weather_service.get_weather(district)
-        if not weather:
-            weather = {'temperature': 30, 'humidity': 80, 'rainfall': 200} # Fallback
+        with stage('weather'):
+            weather = self.weather_service.get_weather(district)
+            if not weather:
+                weather = DEFAULT_WEATHER # Fallback
             
-        # 2. Prepare Input for ML Model
-        # Features: N, P, K, temperature, humidity, ph, rainfall
-        input_data = pd.DataFrame([[n, p, k, weather['temperature'], weather['humidity'], ph, weather['rainfall']]], 
-                                  columns=['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'])
+        # Soil values on the precomputed grid skip the model entirely
+        candidates = None
+        if self.lookup_table is not None:
+            with stage('lookup'):
+                candidates = self.lookup_table.lookup(district, n, p, k, ph)
+            LOOKUP_REQUESTS.inc('hit' if candidates is not None else 'miss')
+
+        if candidates is None:
+            # 2. Prepare Input for ML Model
+            # Features: N, P, K, temperature, humidity, ph, rainfall
+            with stage('input_build'):
+                input_data = self._model_input([[n, p, k, weather['temperature'], weather['humidity'], ph, weather['rainfall']]])
+
+            # 3. Predict Crop Probabilities
+            with stage('predict'):
+                probs = self.model.predict_proba(input_data)[0]
+                classes = self.model.classes_
+
+            if self.ranker is None:
+                # Get top 3 crops
+                top_indices = top_k_indices(probs, TOP_K)
+                candidates = [(classes[idx], probs[idx]) for idx in top_indices]
+
+        # The model's top crop (before market re-ranking), with the same tie-break as top_k_indices
+        predicted = str(candidates[0][0] if candidates is not None else classes[np.argmax(probs)])
+        if self.drift_monitor is not None:
+            self.drift_monitor.record((n, p, k, weather['temperature'], weather['humidity'], ph, weather['rainfall']),
+                                      predicted)
+
+        with stage('market'):
+            if self.ranker is not None:
+                top_crops = self.ranker.rank(district, probs, (n, p, k), soil_type)
+            else:
+                market_lookup = self.market_service.get_price_prediction
+                top_crops = self._rank_candidates(district, candidates, market_lookup)
+            best_choice = top_crops[0]
         
-        # 3. Predict Crop Probabilities
-        probs = self.model.predict_proba(input_data)[0]
-        classes = self.model.classes_
+        # 6. Get Fertilizer Recommendation for Best Crop
+        with stage('fertilizer'):
+            fert_rec = self.fertilizer_engine.recommend(best_choice['crop'], {'N': n, 'P': p, 'K': k}, soil_type, district=district)
         
-        # Get top 3 crops
-        top_indices = np.argsort(probs)[-3:][::-1]
+        return self._build_result(district, n, p, k, ph, weather, top_crops, fert_rec), predicted
+
+    def get_recommendations_batch(self, farms, use_cache=False):
+        """
+        Scores many farms with a single predict_proba call.
+        farms: list of {'district', 'n', 'p', 'k', 'ph' (optional), 'soil_type' (optional)}
+        use_cache: answer farms from (and store them in) the response cache like
+                   get_recommendation does, e.g. for micro-batched single requests
+        Returns: list of results in the same shape as get_recommendation, in input order.
+        """
+        if not self.model:
+            return [{"error": "Model not loaded"} for _ in farms]
+        if not farms:
+            return []
+        if use_cache and self.cache is not None:
+            return self._batch_through_cache(farms)
+        return self._score_batch(farms)[0]
+
+    def _score_batch(self, farms):
+        """Returns (results, the model's own top crop per farm)."""
+        districts = [farm['district'] for farm in farms]
+        soil_types = [farm.get('soil_type', 'Loamy') for farm in farms]
+
+        # 1. Weather for every row as one [rows, 3] block (temperature, humidity, rainfall)
+        with stage('batch_weather'):
+            fallback = (DEFAULT_WEATHER['temperature'], DEFAULT_WEATHER['humidity'], DEFAULT_WEATHER['rainfall'])
+            weather_block = self.weather_service.get_weather_many(districts, fallback=fallback)
+            weather_by_district = {}
+            for district, (temp, hum, rain) in zip(districts, weather_block.tolist()):
+                weather_by_district.setdefault(district, {'temperature': temp, 'humidity': hum, 'rainfall': rain})
+
+        # 2. Build the whole feature matrix in one go
+        with stage('batch_input_build'):
+            X = np.empty((len(farms), len(FEATURE_COLUMNS)), dtype=float)
+            X[:, 0] = [farm['n'] for farm in farms]
+            X[:, 1] = [farm['p'] for farm in farms]
+            X[:, 2] = [farm['k'] for farm in farms]
+            X[:, 3] = weather_block[:, 0]
+            X[:, 4] = weather_block[:, 1]
+            X[:, 5] = [farm.get('ph', 6.5) for farm in farms]
+            X[:, 6] = weather_block[:, 2]
+
+        # 3. One predict_proba for the whole batch
+        with stage('batch_predict'):
+            probs = self.model.predict_proba(self._model_input(X))
+            classes = self.model.classes_
+
+        predicted = probs.argmax(axis=1)
+        if self.drift_monitor is not None:
+            self.drift_monitor.record_batch(X, predicted, classes)
+
+        if self.ranker is not None:
+            with stage('batch_market'):
+                ranked = self.ranker.rank_batch(districts, probs, X[:, :3], soil_types)
+        else:
+            top_indices = top_k_indices(probs, TOP_K)
+
+            # 4. Market lookups are shared by every row with the same (crop, district)
+            with stage('batch_market'):
+                market_cache = {}
+                def market_lookup(crop, district):
+                    key = (crop, district)
+                    if key not in market_cache:
+                        market_cache[key] = self.market_service.get_price_prediction(crop, district)
+                    return market_cache[key]
+
+                ranked = []
+                for row, farm in enumerate(farms):
+                    candidates = [(classes[idx], probs[row, idx]) for idx in top_indices[row]]
+                    ranked.append(self._rank_candidates(farm['district'], candidates, market_lookup))
+
+        # 5. Fertilizer plans for every row's best crop in one vectorized solve
+        with stage('batch_fertilizer'):
+            best_crops = [top_crops[0]['crop'] for top_crops in ranked]
+            fert_batch = self.fertilizer_engine.recommend_batch(best_crops, X[:, :3], soil_types,
+                                                                districts=districts)
+            fert_plans = self.fertilizer_engine.plans_from_batch(best_crops, fert_batch)
+
+        results = []
+        for farm, top_crops, fert_rec in zip(farms, ranked, fert_plans):
+            results.append(self._build_result(farm['district'], farm['n'], farm['p'], farm['k'], farm.get('ph', 6.5),
+                                              weather_by_district[farm['district']], top_crops, fert_rec))
+        return results, [str(crop) for crop in np.asarray(classes)[predicted]]
+
+    def _batch_through_cache(self, farms):
+        with stage('cache_lookup'):
+            data_version = self.market_service.data_version()
+            keys = [self.cache.make_key(self.cache_version, data_version, farm['district'], farm['n'], farm['p'],
+                                        farm['k'], farm.get('ph', 6.5), farm.get('soil_type', 'Loamy'))
+                    for farm in farms]
+            entries = [self.cache.get_entry(key) for key in keys]
+        results = [None] * len(farms)
+        misses = []
+        for i, entry in enumerate(entries):
+            if entry is None:
+                misses.append(i)
+            else:
+                results[i] = entry['result']
+                self._record_drift(entry['result'], entry['predicted_crop'])
+        if misses:
+            scored, predicted = self._score_batch([farms[i] for i in misses])
+            for i, result, crop in zip(misses, scored, predicted):
+                self.cache.set(keys[i], result, crop)
+                results[i] = result
+        return results
+
+    def _record_drift(self, result, predicted_crop):
+        """
+        Counts a cache hit in the drift sketches like a scored request, so repeated
+        inputs are not undercounted. predicted_crop is the model's top crop stored with
+        the entry by the miss that scored it.
+        """
+        if self.drift_monitor is None:
+            return
+        soil, weather = result['inputs']['soil'], result['weather_context']
+        self.drift_monitor.record((soil['N'], soil['P'], soil['K'], weather['temperature'], weather['humidity'],
+                                   soil['pH'], weather['rainfall']), predicted_crop)
+
+    def _model_input(self, rows):
+        # sklearn models were fitted on a DataFrame and warn without column names;
+        # the compiled engine takes the raw matrix.
+        if isinstance(self.model, CompiledForest):
+            return np.asarray(rows, dtype=float)
+        return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+    def _rank_candidates(self, district, candidates, market_lookup):
+        """
+        candidates: list of (crop_name, confidence) from the model.
+        Returns candidates blended with market potential, best first.
+        """
         top_crops = []
         
-        for idx in top_indices:
-            crop_name = classes[idx]
-            confidence = probs[idx]
-            
+        for crop_name, confidence in candidates:
             # 4. Check Market Potential
-            market_info = self.market_service.get_price_prediction(crop_name, district)
+            market_info = market_lookup(crop_name, district)
             
             # 5. Calculate Weighted Score
             # Score = (Confidence * 0.7) + (Profitability/100 * 0.3)
@@ -66,11 +363,10 @@ class RecommenderSystem:
             
         # Sort by final score
         top_crops.sort(key=lambda x: x['final_score'], reverse=True)
+        return top_crops
+
+    def _build_result(self, district, n, p, k, ph, weather, top_crops, fert_rec):
         best_choice = top_crops[0]
-        
-        # 6. Get Fertilizer Recommendation for Best Crop
-        fert_rec = self.fertilizer_engine.recommend(best_choice['crop'], {'N': n, 'P': p, 'K': k})
-        
         return {
             'inputs': {
                 'district': district,
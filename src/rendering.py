@@ -0,0 +1,100 @@
+import csv
+import hashlib
+import json
+import os
+
+from .cache import LocalCache
+
+DEFAULT_LANGUAGE = 'ta'
+
+# Page labels. Other languages are shown next to the English text ("Best Crop / சிறந்த பயிர்").
+LABELS = {
+    'en': {
+        'title': 'Crop Recommendation', 'best_crop': 'Best Crop', 'top_crops': 'Top Recommendations',
+        'crop': 'Crop', 'confidence': 'Confidence', 'market_price': 'Market Price', 'trend': 'Trend',
+        'score': 'Score', 'fertilizer_plan': 'Fertilizer Plan', 'schedule': 'Schedule',
+        'total_cost': 'Total Cost', 'net_return': 'Net Return / acre', 'weather': 'Weather', 'back': 'Back',
+    },
+    'ta': {
+        'title': 'பயிர் பரிந்துரை', 'best_crop': 'சிறந்த பயிர்', 'top_crops': 'முதன்மை பரிந்துரைகள்',
+        'crop': 'பயிர்', 'confidence': 'நம்பகத்தன்மை', 'market_price': 'சந்தை விலை', 'trend': 'போக்கு',
+        'score': 'மதிப்பெண்', 'fertilizer_plan': 'உர திட்டம்', 'schedule': 'அட்டவணை',
+        'total_cost': 'மொத்த செலவு', 'net_return': 'நிகர வருமானம் / ஏக்கர்', 'weather': 'வானிலை', 'back': 'திரும்பு',
+    },
+    'hi': {
+        'title': 'फसल सिफारिश', 'best_crop': 'सर्वोत्तम फसल', 'top_crops': 'शीर्ष सिफारिशें',
+        'crop': 'फसल', 'confidence': 'विश्वास', 'market_price': 'बाज़ार भाव', 'trend': 'रुझान',
+        'score': 'अंक', 'fertilizer_plan': 'उर्वरक योजना', 'schedule': 'समय-सारणी',
+        'total_cost': 'कुल लागत', 'net_return': 'शुद्ध आय / एकड़', 'weather': 'मौसम', 'back': 'वापस',
+    },
+    'te': {
+        'title': 'పంట సిఫార్సు', 'best_crop': 'ఉత్తమ పంట', 'top_crops': 'ముఖ్య సిఫార్సులు',
+        'crop': 'పంట', 'confidence': 'నమ్మకం', 'market_price': 'మార్కెట్ ధర', 'trend': 'ధోరణి',
+        'score': 'స్కోరు', 'fertilizer_plan': 'ఎరువుల ప్రణాళిక', 'schedule': 'షెడ్యూల్',
+        'total_cost': 'మొత్తం ఖర్చు', 'net_return': 'నికర ఆదాయం / ఎకరం', 'weather': 'వాతావరణం', 'back': 'వెనక్కి',
+    },
+}
+
+
+def load_crop_translations(path='crop_translations.csv'):
+    """
+    Reads crop names per language from a CSV with a Crop column and one column
+    per language code. Returns {lang: {crop: local name}}; blank cells are skipped.
+    """
+    translations = {}
+    if not os.path.exists(path):
+        print(f"Crop translations not found at {path}; showing English names only.")
+        return translations
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            crop = row.pop('Crop')
+            for lang, name in row.items():
+                if name:
+                    translations.setdefault(lang, {})[crop] = name
+    return translations
+
+
+class ResultRenderer:
+    """
+    Renders recommendation results to HTML.
+    The template is compiled once, translations are loaded once, and rendered
+    pages are cached by (language, result payload), so a repeated result costs
+    one JSON dump and a hash, about the same as the JSON endpoint.
+    """
+    def __init__(self, jinja_env, template='result.html', translations_path='crop_translations.csv',
+                 cache_entries=4096):
+        self.template = jinja_env.get_template(template)
+        self.crop_names = load_crop_translations(translations_path)
+        self.languages = ['en'] + [lang for lang in LABELS if lang != 'en']
+        self.labels = {lang: self._labels_for(lang) for lang in self.languages}
+        self.fragments = LocalCache(max_entries=cache_entries, ttl=24 * 3600)
+
+    def _labels_for(self, lang):
+        if lang == 'en':
+            return dict(LABELS['en'])
+        local = LABELS[lang]
+        return {key: f"{text} / {local[key]}" if key in local else text for key, text in LABELS['en'].items()}
+
+    def pick_language(self, requested=None, accept_languages=None):
+        """
+        requested: explicit lang value; accept_languages: werkzeug LanguageAccept (Accept-Language).
+        Pages are bilingual, so a browser that only asks for English still gets the Tamil default;
+        pass lang=en for English only.
+        """
+        if requested in self.labels:
+            return requested
+        if accept_languages:
+            best = accept_languages.best_match([lang for lang in self.languages if lang != 'en'])
+            if best:
+                return best
+        return DEFAULT_LANGUAGE
+
+    def render(self, result, lang=DEFAULT_LANGUAGE):
+        payload = json.dumps(result, sort_keys=True, default=str)
+        key = hashlib.sha1(f"{lang}|{payload}".encode('utf-8')).hexdigest()
+        html = self.fragments.get(key)
+        if html is None:
+            html = self.template.render(result=result, lang=lang, labels=self.labels[lang],
+                                        crop_names=self.crop_names.get(lang, {}))
+            self.fragments.set(key, html)
+        return html
@@ -0,0 +1,202 @@
+import math
+import numbers
+
+# Request fields: name -> (allowed range or None, default; None means required)
+NUMERIC_FIELDS = {
+    'n': ((0, 500), None),
+    'p': ((0, 300), None),
+    'k': ((0, 600), None),
+    'ph': ((3.0, 10.0), 6.5),
+}
+SOIL_TYPES = ['Loamy', 'Sandy', 'Clayey', 'Red', 'Black']
+DEFAULT_SOIL_TYPE = 'Loamy'
+
+
+class ValidationError(ValueError):
+    """Raised for a bad request; `errors` maps field name -> message."""
+    def __init__(self, errors):
+        super().__init__('; '.join(f"{field}: {message}" for field, message in errors.items()))
+        self.errors = errors
+
+
+class RequestSchema:
+    """
+    Validates recommendation requests before they reach the model:
+      district   one of the known districts (case-insensitive)
+      n, p, k    numbers within NUMERIC_FIELDS ranges (required)
+      ph         number within range, default 6.5
+      soil_type  one of SOIL_TYPES (case-insensitive), default Loamy
+    parse() checks one request; parse_batch() checks many column by column.
+    """
+    def __init__(self, districts=None, normals_path='weather_normals.csv'):
+        if districts is None:
+            from .api_integration import load_weather_normals
+            districts = list(load_weather_normals(normals_path)[0])
+        self.districts = list(districts)
+        self._districts = {d.lower(): d for d in self.districts}
+        self._soil_types = {s.lower(): s for s in SOIL_TYPES}
+
+    def parse(self, data):
+        """Returns a farm dict for get_recommendation, or raises ValidationError."""
+        if not isinstance(data, dict):
+            raise ValidationError({'request': 'expected a JSON object'})
+        data = {str(key).lower(): value for key, value in data.items()}
+        farm, errors = {}, {}
+
+        district = data.get('district')
+        if district is None or district == '':
+            errors['district'] = 'is required'
+        else:
+            farm['district'] = self._districts.get(str(district).strip().lower())
+            if farm['district'] is None:
+                errors['district'] = f"unknown district '{district}'"
+
+        for field, ((low, high), default) in NUMERIC_FIELDS.items():
+            value = data.get(field)
+            if value is None or value == '':
+                if default is None:
+                    errors[field] = 'is required'
+                else:
+                    farm[field] = default
+                continue
+            number = _number(value)
+            if number is None:
+                errors[field] = 'must be a number'
+            elif not low <= number <= high:
+                errors[field] = f"must be between {low} and {high}"
+            else:
+                # Keep JSON numbers as sent so responses echo them unchanged
+                farm[field] = value if isinstance(value, numbers.Real) else number
+
+        soil_type = data.get('soil_type')
+        if soil_type is None or soil_type == '':
+            farm['soil_type'] = DEFAULT_SOIL_TYPE
+        else:
+            farm['soil_type'] = self._soil_types.get(str(soil_type).strip().lower())
+            if farm['soil_type'] is None:
+                errors['soil_type'] = f"must be one of {', '.join(SOIL_TYPES)}"
+
+        if errors:
+            raise ValidationError(errors)
+        return farm
+
+    def parse_batch(self, rows):
+        """
+        Validates a batch column by column.
+        rows: DataFrame or list of dicts
+        Returns (farms, errors): farms is a list of (row number, farm dict) for valid rows,
+        errors a list of (row number, {field: message}) for rejected ones.
+        """
+        # numpy/pandas are only needed for batches; keep them out of app import time
+        import numpy as np
+        import pandas as pd
+        not_object = None
+        if isinstance(rows, pd.DataFrame):
+            df = rows.rename(columns=lambda c: str(c).lower())
+            if df.columns.duplicated().any():
+                # 'N' and 'n' both present: take whichever is filled
+                df = df.T.groupby(level=0, sort=False).first().T
+        else:
+            not_object = np.array([not isinstance(row, dict) for row in rows], dtype=bool)
+            # Explicit index: all-empty rows would otherwise give a 0-row frame
+            df = pd.DataFrame.from_records([{str(key).lower(): value for key, value in row.items()}
+                                            if isinstance(row, dict) else {} for row in rows],
+                                           index=range(len(rows)))
+        count = len(df)
+        messages = {}  # field -> object array of messages ('' where fine)
+
+        def column(name):
+            return df[name] if name in df.columns else pd.Series([None] * count, index=df.index, dtype=object)
+
+        district = self._enum_column(column('district'), self._districts, None)
+        messages['district'] = np.where(district == '', 'is required',
+                                        np.where(pd.isna(district), 'unknown district', '')).astype(object)
+
+        values = {}
+        for field, ((low, high), default) in NUMERIC_FIELDS.items():
+            raw = column(field)
+            numbers_ = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=float, copy=True)
+            # to_numeric turns true/false into 1/0; parse() rejects booleans, so do the same
+            if raw.dtype == bool:
+                numbers_[:] = np.nan
+            elif raw.dtype == object:
+                numbers_[raw.map(type).isin([bool, np.bool_]).to_numpy()] = np.nan
+            missing = raw.isna().to_numpy().copy()
+            unparsed = np.isnan(numbers_) & ~missing
+            if unparsed.any():
+                # Blank strings count as missing, anything else unparseable is an error
+                blank = (raw[unparsed].astype(str).str.strip() == '').to_numpy()
+                missing[np.flatnonzero(unparsed)[blank]] = True
+            if default is not None:
+                numbers_[missing] = default
+            bad_number = ~missing & np.isnan(numbers_)
+            out_of_range = ~np.isnan(numbers_) & ((numbers_ < low) | (numbers_ > high))
+            messages[field] = np.select(
+                [missing & (default is None), bad_number, out_of_range],
+                ['is required', 'must be a number', f"must be between {low} and {high}"], '').astype(object)
+            values[field] = numbers_
+
+        soil = self._enum_column(column('soil_type'), self._soil_types, DEFAULT_SOIL_TYPE)
+        messages['soil_type'] = np.where(pd.isna(soil), f"must be one of {', '.join(SOIL_TYPES)}", '').astype(object)
+
+        if not_object is not None and not_object.any():
+            # Only report the row itself, not every field it is missing
+            for field_messages in messages.values():
+                field_messages[not_object] = ''
+            messages['row'] = np.where(not_object, 'expected an object', '').astype(object)
+
+        bad = np.zeros(count, dtype=bool)
+        for field_messages in messages.values():
+            bad |= field_messages != ''
+
+        good = np.flatnonzero(~bad)
+        columns = [district[good].tolist()] + [values[field][good].tolist() for field in ('n', 'p', 'k', 'ph')]
+        farms = [(i, {'district': d, 'n': n, 'p': p, 'k': k, 'ph': ph, 'soil_type': soil_type})
+                 for i, d, n, p, k, ph, soil_type in zip(good.tolist(), *columns, soil[good].tolist())]
+        errors = [(i, {field: str(field_messages[i]) for field, field_messages in messages.items() if field_messages[i]})
+                  for i in np.flatnonzero(bad).tolist()]
+        return farms, errors
+
+    @staticmethod
+    def _enum_column(raw, canonical, default):
+        """
+        Maps a column onto canonical names case-insensitively, one lookup per distinct value.
+        Returns an object array: canonical name, `default` (or '' when there is none) for
+        blanks, NaN for unknown values.
+        """
+        import numpy as np
+        import pandas as pd
+        codes, uniques = pd.factorize(raw)
+        mapped = []
+        for value in uniques:
+            text = str(value).strip()
+            mapped.append((default or '') if text == '' else canonical.get(text.lower(), np.nan))
+        # factorize gives code -1 to missing values
+        mapped.append(default or '')
+        return np.array(mapped, dtype=object)[codes]
+
+
+def merge_batch_results(farms, errors, scored):
+    """
+    Puts results for parse_batch's valid rows (scored, in `farms` order) and error
+    entries for its rejected rows back into input order.
+    """
+    results = [None] * (len(farms) + len(errors))
+    for (i, _), result in zip(farms, scored):
+        results[i] = result
+    for i, fields in errors:
+        results[i] = {'error': 'Invalid row', 'fields': fields}
+    return results
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, numbers.Real):
+        number = float(value)
+    else:
+        try:
+            number = float(str(value).strip())
+        except ValueError:
+            return None
+    return None if math.isnan(number) or math.isinf(number) else number
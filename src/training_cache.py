@@ -0,0 +1,180 @@
+"""
+Memory-mapped columnar cache of training CSVs.
+
+The first load of a CSV streams it once and writes, under
+<cache root>/<file name>-<path hash>/:
+  features.npy    float32 [7, rows], one contiguous column per feature
+  labels.npy      uint8/uint16 [rows] codes into the sorted class list
+  manifest.json   source path, size, mtime, content hash, classes, row count
+Later loads open both arrays memory-mapped, so training, evaluation and
+benchmarks skip CSV parsing and share the pages. The cache is rebuilt when the
+CSV's content hash changes (checked whenever its size or mtime changes).
+
+    python -m src.training_cache crop_recommendation.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+LABEL_COLUMN = 'label'
+CACHE_ROOT = 'data/training_cache'
+MANIFEST_FILE = 'manifest.json'
+# Bump when the on-disk layout changes
+FORMAT_VERSION = 1
+
+
+def content_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_dir_for(data_path, cache_root=CACHE_ROOT):
+    source = os.path.abspath(data_path)
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_root, f"{name}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}")
+
+
+class TrainingData:
+    """
+    A cached training set:
+      X        float32 [rows, 7] view of the column-major features (no copy)
+      codes    [rows] label codes; classes[codes] are the crop names
+      classes  sorted crop names
+    """
+    def __init__(self, cache_dir, mmap=True):
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        mode = 'r' if mmap else None
+        self.columns = np.load(os.path.join(cache_dir, 'features.npy'), mmap_mode=mode)
+        self.codes = np.load(os.path.join(cache_dir, 'labels.npy'), mmap_mode=mode)
+        self.classes = np.array(self.manifest['classes'], dtype=object)
+        self.content_hash = self.manifest['content_hash']
+
+    @property
+    def X(self):
+        return self.columns.T
+
+    @property
+    def labels(self):
+        """Crop names per row (materialized; use codes where names are not needed)."""
+        return self.classes[self.codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def _is_fresh(manifest, data_path, stat):
+    if manifest.get('format') != FORMAT_VERSION:
+        return False
+    if (manifest['source_size'], manifest['source_mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return True
+    # Touched or copied: only the content decides
+    return manifest['content_hash'] == content_hash(data_path)
+
+
+def load_training_cache(data_path, cache_root=CACHE_ROOT, chunksize=500_000):
+    """TrainingData for a CSV, converting it on first use or when its content changed."""
+    cache_dir = cache_dir_for(data_path, cache_root)
+    stat = os.stat(data_path)
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if _is_fresh(manifest, data_path, stat):
+            if manifest['source_mtime_ns'] != stat.st_mtime_ns or manifest['source_size'] != stat.st_size:
+                manifest.update(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+                _write_manifest(manifest_path, manifest)
+            return TrainingData(cache_dir)
+        print(f"{data_path} changed; rebuilding its training cache.")
+    build_training_cache(data_path, cache_dir, chunksize)
+    return TrainingData(cache_dir)
+
+
+def build_training_cache(data_path, cache_dir, chunksize=500_000):
+    """Streams the CSV once into per-column scratch files, then lays them out as .npy arrays."""
+    import pandas as pd
+    stat = os.stat(data_path)
+    digest = content_hash(data_path)
+    staging = f"{cache_dir.rstrip('/')}.staging-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    scratch = [open(os.path.join(staging, f"{name}.f32"), 'wb') for name in FEATURE_COLUMNS]
+    label_ids = {}  # crop -> code in first-seen order, remapped to sorted order at the end
+    label_parts = []
+    rows = 0
+    try:
+        reader = pd.read_csv(data_path, usecols=FEATURE_COLUMNS + [LABEL_COLUMN],
+                             dtype={c: np.float32 for c in FEATURE_COLUMNS}, chunksize=chunksize)
+        for chunk in reader:
+            chunk = chunk.dropna()
+            for f, name in zip(scratch, FEATURE_COLUMNS):
+                f.write(chunk[name].to_numpy(dtype=np.float32).tobytes())
+            codes, uniques = pd.factorize(chunk[LABEL_COLUMN].astype(str))
+            remap = np.array([label_ids.setdefault(crop, len(label_ids)) for crop in uniques], dtype=np.int64)
+            label_parts.append(remap[codes] if len(codes) else codes)
+            rows += len(chunk)
+    finally:
+        for f in scratch:
+            f.close()
+
+    columns = np.lib.format.open_memmap(os.path.join(staging, 'features.npy'), mode='w+',
+                                        dtype=np.float32, shape=(len(FEATURE_COLUMNS), rows))
+    for i, name in enumerate(FEATURE_COLUMNS):
+        path = os.path.join(staging, f"{name}.f32")
+        columns[i] = np.fromfile(path, dtype=np.float32)
+        os.remove(path)
+    columns.flush()
+    del columns
+
+    classes = sorted(label_ids)
+    order = np.empty(len(classes), dtype=np.int64)
+    for code, crop in enumerate(classes):
+        order[label_ids[crop]] = code
+    dtype = np.uint8 if len(classes) <= 256 else np.uint16
+    codes = order[np.concatenate(label_parts)] if label_parts else np.zeros(0, dtype=np.int64)
+    np.save(os.path.join(staging, 'labels.npy'), codes.astype(dtype))
+
+    _write_manifest(os.path.join(staging, MANIFEST_FILE), {
+        'format': FORMAT_VERSION,
+        'source': os.path.abspath(data_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'content_hash': digest,
+        'feature_columns': FEATURE_COLUMNS,
+        'classes': classes,
+        'rows': rows,
+    })
+    # Swap the finished cache in whole; readers of the old one keep their mapped pages
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    try:
+        os.replace(staging, cache_dir)
+    except OSError:
+        # Another process finished the same conversion first
+        shutil.rmtree(staging, ignore_errors=True)
+    print(f"Cached {rows} rows of {data_path} in {cache_dir}")
+
+
+def _write_manifest(path, manifest):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert training CSVs into the memory-mapped training cache.")
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--cache-root', default=CACHE_ROOT)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args()
+    for path in args.csv:
+        data = load_training_cache(path, args.cache_root, args.chunksize)
+        print(f"{path}: {len(data)} rows, {len(data.classes)} crops, content {data.content_hash[:12]}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the app packages (src/, app.py) from the repo root, with its data files
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,19 @@
+from types import SimpleNamespace
+
+from src.model_manager import ModelManager
+
+
+def test_route_ignores_int_vs_float_inputs():
+    active = SimpleNamespace(model_version='a')
+    candidate = SimpleNamespace(model_version='b')
+    manager = ModelManager(active, registry_dir=None)
+    manager._serving = (active, 'v1', candidate, 'v2', 0.5)
+
+    roles = set()
+    for n in range(0, 200, 5):
+        as_int = manager._route('Salem', n, 40, 40, 6, 'Loamy')
+        as_float = manager._route('Salem', float(n), 40.0, 40.0, 6.0, 'Loamy')
+        assert as_int == as_float
+        roles.add(as_int[1])
+    # Both versions actually get traffic at this fraction
+    assert roles == {'active', 'candidate'}
@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.api_integration import MarketService
+from src.fertilizer_engine import FertilizerEngine
+from src.ranking import RankingEngine
+
+CLASSES = ['Banana', 'Blackgram', 'Coconut', 'Cotton', 'Groundnut', 'Maize', 'Rice', 'Sugarcane', 'Tapioca',
+           'Turmeric']
+
+
+def test_rank_batch_matches_rank_on_ties_at_the_boundary():
+    # Suitability only, so scores are the (tied) probabilities
+    engine = RankingEngine(CLASSES, MarketService(), FertilizerEngine(), top_k=3, min_probability=0.0,
+                           weights={'suitability': 1.0, 'revenue': 0.0, 'cost': 0.0})
+    rng = np.random.default_rng(0)
+    probs = np.full((200, len(CLASSES)), 0.05)
+    for row in probs:
+        # One clear winner, then a tie across the 2nd/3rd places and beyond
+        tied = rng.choice(len(CLASSES), size=5, replace=False)
+        row[tied[0]] = 0.35
+        row[tied[1:]] = 0.1
+    probs /= probs.sum(axis=1, keepdims=True)
+    soil = np.tile([90.0, 40.0, 40.0], (len(probs), 1))
+    districts = ['Salem'] * len(probs)
+
+    batch = engine.rank_batch(districts, probs, soil, ['Loamy'] * len(probs))
+    single = [engine.rank('Salem', row, soil[0], 'Loamy') for row in probs]
+    assert batch == single
+    # Ties go to the lower class index
+    for row, entries in zip(probs, single):
+        tied = np.flatnonzero(np.isclose(row, row[np.argsort(-row)[1]]))
+        assert [entry['crop'] for entry in entries[1:]] == [CLASSES[i] for i in tied[:2]]
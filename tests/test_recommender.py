@@ -0,0 +1,47 @@
+import pytest
+
+from src.cache import RecommendationCache
+from src.recommender import RecommenderSystem
+
+FARMS = [
+    {'district': 'Salem', 'n': 90, 'p': 42, 'k': 43, 'ph': 6.5, 'soil_type': 'Loamy'},
+    {'district': 'Erode', 'n': 20, 'p': 60, 'k': 20, 'ph': 7.0, 'soil_type': 'Red'},
+    {'district': 'Madurai', 'n': 60, 'p': 55, 'k': 44, 'ph': 5.5, 'soil_type': 'Black'},
+    {'district': 'Thanjavur', 'n': 80, 'p': 40, 'k': 40, 'ph': 6.0, 'soil_type': 'Clayey'},
+]
+
+
+class RecordingMonitor:
+    def __init__(self):
+        self.rows = []
+
+    def record(self, features, crop):
+        self.rows.append((tuple(float(x) for x in features), crop))
+
+    def record_batch(self, X, class_indices, classes):
+        for row, c in zip(X, class_indices):
+            self.rows.append((tuple(float(x) for x in row), str(classes[c])))
+
+
+@pytest.mark.parametrize('ranking', ['blend', 'multi'])
+def test_cache_hits_record_the_same_predicted_crop(ranking):
+    recommender = RecommenderSystem(cache=RecommendationCache(), lookup_path=None, ranking=ranking)
+    if not recommender.model:
+        pytest.skip("no trained model")
+    recommender.drift_monitor = RecordingMonitor()
+
+    for farm in FARMS:
+        recommender.get_recommendation(**farm)
+    misses = list(recommender.drift_monitor.rows)
+    recommender.drift_monitor.rows = []
+    for farm in FARMS:
+        recommender.get_recommendation(**farm)
+    assert recommender.cache.hits == len(FARMS)
+    assert recommender.drift_monitor.rows == misses
+
+    # Batch misses and batch hits agree with the single path too
+    recommender.cache = RecommendationCache()
+    for _ in range(2):
+        recommender.drift_monitor.rows = []
+        recommender.get_recommendations_batch(FARMS, use_cache=True)
+        assert recommender.drift_monitor.rows == misses
@@ -0,0 +1,31 @@
+import pytest
+
+from src.schema import RequestSchema, ValidationError
+
+
+@pytest.fixture
+def schema():
+    return RequestSchema(districts=['Salem', 'Erode'])
+
+
+@pytest.mark.parametrize('rows', [[1, 'x', None], [{}, {}]])
+def test_parse_batch_reports_every_row(schema, rows):
+    farms, errors = schema.parse_batch(rows)
+    assert farms == []
+    assert [i for i, _ in errors] == list(range(len(rows)))
+
+
+def test_parse_batch_rejects_non_objects(schema):
+    farms, errors = schema.parse_batch([{'district': 'Salem', 'n': 90, 'p': 40, 'k': 40}, 'x'])
+    assert [i for i, _ in farms] == [0]
+    assert errors == [(1, {'row': 'expected an object'})]
+
+
+def test_booleans_are_not_numbers(schema):
+    row = {'district': 'Salem', 'n': True, 'p': 40, 'k': 40}
+    with pytest.raises(ValidationError) as e:
+        schema.parse(row)
+    assert e.value.errors == {'n': 'must be a number'}
+    farms, errors = schema.parse_batch([row])
+    assert farms == []
+    assert errors == [(0, {'n': 'must be a number'})]